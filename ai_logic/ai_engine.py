@@ -3,17 +3,16 @@ import numpy as np
 from sklearn.ensemble import RandomForestRegressor
 from datetime import timedelta
 
-def generate_price_forecast(historical_data, days_to_predict=7):
+def train_price_model(historical_data):
     """
-    Takes historical commodity data and predicts future prices.
-    
+    Fits the price model once so it can be reused for any forecast horizon.
+
     :param historical_data: List of dictionaries [{'date': datetime, 'price': float}]
-    :param days_to_predict: Number of future days to forecast
-    :return: Dictionary containing future dates and predicted prices
+    :return: Dictionary with the fitted model and the anchors needed to predict forward
     """
     # 1. Convert database records to a Pandas DataFrame
     df = pd.DataFrame(historical_data)
-    
+
     # If there isn't enough data to train a model, return a fallback
     if len(df) < 5:
         return {"error": "Insufficient historical data for AI forecasting."}
@@ -32,21 +31,43 @@ def generate_price_forecast(historical_data, days_to_predict=7):
     model = RandomForestRegressor(n_estimators=100, random_state=42)
     model.fit(X, y)
 
+    return {
+        "model": model,
+        "last_date": df['date'].max(),
+        "last_day_num": df['days_since_start'].max(),
+        "last_price": y.iloc[-1]
+    }
+
+def predict_prices(trained, days_to_predict=7):
+    """Runs a model from train_price_model forward and formats the output for Chart.js."""
+    if "error" in trained:
+        return {"error": trained["error"]}
+
     # 4. Generate Future Dates for Prediction
-    last_date = df['date'].max()
-    last_day_num = df['days_since_start'].max()
-    
+    last_date = trained['last_date']
+    last_day_num = trained['last_day_num']
+
     future_days_num = np.array([[last_day_num + i] for i in range(1, days_to_predict + 1)])
     future_dates = [(last_date + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(1, days_to_predict + 1)]
 
     # 5. Make Predictions
-    predicted_prices = model.predict(future_days_num)
+    predicted_prices = trained['model'].predict(future_days_num)
 
     # 6. Format the output for the frontend Chart.js
     forecast_results = {
         "future_dates": future_dates,
         "predicted_prices": [round(price, 2) for price in predicted_prices],
-        "trend_direction": "up" if predicted_prices[-1] > y.iloc[-1] else "down"
+        "trend_direction": "up" if predicted_prices[-1] > trained['last_price'] else "down"
     }
-    
-    return forecast_results
\ No newline at end of file
+
+    return forecast_results
+
+def generate_price_forecast(historical_data, days_to_predict=7):
+    """
+    Takes historical commodity data and predicts future prices.
+
+    :param historical_data: List of dictionaries [{'date': datetime, 'price': float}]
+    :param days_to_predict: Number of future days to forecast
+    :return: Dictionary containing future dates and predicted prices
+    """
+    return predict_prices(train_price_model(historical_data), days_to_predict)
@@ -0,0 +1,42 @@
+import numpy as np
+
+from ai_logic.preprocess import build_features
+from ai_logic.train import fit_trend_models
+
+def predict_trends(models, features, days_to_predict=7):
+    """
+    Projects every fitted series forward together.
+
+    :return: { series_id: forecast } in the same shape generate_price_forecast returns
+    """
+    horizon = np.arange(1, days_to_predict + 1)
+
+    # 1. (series x horizon) matrices of future time steps, prices and dates
+    future_t = features['last_t'][:, None] + horizon
+    predicted = models['intercept'][:, None] + models['slope'][:, None] * future_t
+    predicted = np.round(np.maximum(predicted, 0.0), 2)
+    future_days = (features['last_day'][:, None] + horizon).astype('datetime64[D]')
+    future_dates = np.datetime_as_string(future_days, unit='D')
+
+    # 2. Package per series for the frontend Chart.js
+    results = {}
+    for i, series_id in enumerate(features['series_ids']):
+        if not models['valid'][i]:
+            results[series_id] = {"error": "Insufficient historical data for AI forecasting."}
+            continue
+        results[series_id] = {
+            "future_dates": future_dates[i].tolist(),
+            "predicted_prices": predicted[i].tolist(),
+            "trend_direction": "up" if predicted[i, -1] > features['last_price'][i] else "down"
+        }
+    return results
+
+def forecast_many(frame, days_to_predict=7, half_life_days=30.0, min_points=5):
+    """
+    Forecasts every series in a long-format frame (series_id, date, price) in one call.
+    """
+    if frame.empty:
+        return {}
+    features = build_features(frame)
+    models = fit_trend_models(features, half_life_days=half_life_days, min_points=min_points)
+    return predict_trends(models, features, days_to_predict)
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+def to_long_frame(series_map):
+    """
+    Flattens many price series into one long-format frame.
+
+    :param series_map: { series_id: [{'date': datetime, 'price': float}, ...] }
+    :return: DataFrame with columns series_id, date, price
+    """
+    rows = [(series_id, point['date'], point['price'])
+            for series_id, points in series_map.items() for point in points]
+    return pd.DataFrame(rows, columns=['series_id', 'date', 'price'])
+
+def build_features(frame):
+    """
+    Turns a long-format frame (series_id, date, price) into NumPy arrays covering every series at once.
+
+    Rows are sorted by (series, date) and each series gets its own time axis
+    (days since its first observation), so no per-series Python loop is needed.
+    """
+    frame = frame.dropna(subset=['series_id', 'date', 'price'])
+    codes, series_ids = pd.factorize(frame['series_id'])
+    days = pd.to_datetime(frame['date']).to_numpy(dtype='datetime64[D]').astype(np.int64)
+    prices = frame['price'].to_numpy(dtype=np.float64)
+
+    # 1. Sort by series, then date
+    order = np.lexsort((days, codes))
+    codes, days, prices = codes[order], days[order], prices[order]
+
+    # 2. Series boundaries in the sorted arrays
+    n_series = len(series_ids)
+    counts = np.bincount(codes, minlength=n_series)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    ends = starts + counts - 1
+
+    # 3. Per-series time axis
+    first_day = days[starts]
+    t = (days - first_day[codes]).astype(np.float64)
+
+    return {
+        'series_ids': np.asarray(series_ids),
+        'codes': codes,
+        't': t,
+        'y': prices,
+        'counts': counts,
+        'last_t': t[ends],
+        'last_day': days[ends],
+        'last_price': prices[ends]
+    }
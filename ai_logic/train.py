@@ -0,0 +1,39 @@
+import numpy as np
+
+def fit_trend_models(features, half_life_days=30.0, min_points=5):
+    """
+    Fits a recency-weighted linear trend to every series in one pass.
+
+    Weighted least squares has a closed form, so the grouped sums for all series
+    are computed with np.bincount instead of training one model per series.
+    Observations lose half their weight every half_life_days, which keeps the
+    trend anchored to recent market behaviour.
+
+    :param features: Output of preprocess.build_features
+    :return: Dictionary of per-series arrays (slope, intercept, valid)
+    """
+    codes, t, y = features['codes'], features['t'], features['y']
+    n_series = len(features['series_ids'])
+
+    # 1. Recency weights relative to each series' latest observation
+    age = features['last_t'][codes] - t
+    w = np.power(0.5, age / half_life_days)
+
+    # 2. Grouped weighted sums for every series at once
+    def grouped(values):
+        return np.bincount(codes, weights=values, minlength=n_series)
+
+    s_w, s_wt, s_wy = grouped(w), grouped(w * t), grouped(w * y)
+    s_wtt, s_wty = grouped(w * t * t), grouped(w * t * y)
+
+    # 3. Closed-form slope & intercept (flat line when all points share one date)
+    denom = s_w * s_wtt - s_wt ** 2
+    safe = np.abs(denom) > 1e-9
+    slope = np.where(safe, (s_w * s_wty - s_wt * s_wy) / np.where(safe, denom, 1.0), 0.0)
+    intercept = (s_wy - slope * s_wt) / np.where(s_w > 0, s_w, 1.0)
+
+    return {
+        'slope': slope,
+        'intercept': intercept,
+        'valid': features['counts'] >= min_points
+    }
@@ -27,8 +27,8 @@ def api_admin_update_user():
         return jsonify({"error": "Missing parameters"}), 400
         
     try:
-        # Update the exact user in the Realtime Database
-        rtdb.reference(f'users/{uid}').update({
+        # Update the exact user in the Realtime Database (and move their index entries)
+        update_user_profile(rtdb, uid, {
             'role': new_role,
             'subscription_tier': new_tier
         })
@@ -0,0 +1,59 @@
+"""
+Worker cold-start benchmark.
+
+Imports main.py in fresh interpreters (exactly what a new gunicorn worker does)
+and reports wall-clock import time and peak RSS, with and without the
+forecasting stack (pandas / NumPy / scikit-learn) being pulled in at boot.
+
+    python bench_cold_start.py            # 5 runs per mode
+    python bench_cold_start.py --runs 10
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+CHILD = r"""
+import json, resource, sys, time
+started = time.perf_counter()
+import main
+if {eager}:
+    import ai_logic.ai_engine  # what every worker paid before the lazy import
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    'seconds': elapsed,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'forecast_stack_loaded': all(m in sys.modules for m in ('pandas', 'numpy', 'sklearn'))
+}}))
+if main.scheduler.running:
+    main.scheduler.shutdown(wait=False)
+"""
+
+
+def measure(eager, runs):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', CHILD.format(eager=eager)],
+                             capture_output=True, text=True, check=True).stdout
+        # main.py prints its own startup banner; the measurement is the last line
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+    return {
+        'seconds': statistics.median(s['seconds'] for s in samples),
+        'rss_mb': statistics.median(s['rss_mb'] for s in samples),
+        'forecast_stack_loaded': samples[-1]['forecast_stack_loaded']
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure worker cold start and RSS.")
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    eager = measure(True, args.runs)
+    lazy = measure(False, args.runs)
+
+    print(f"{'mode':<8}{'import (s)':>12}{'peak RSS (MB)':>16}{'forecast stack':>16}")
+    for name, result in (('eager', eager), ('lazy', lazy)):
+        print(f"{name:<8}{result['seconds']:>12.2f}{result['rss_mb']:>16.1f}{str(result['forecast_stack_loaded']):>16}")
+    print(f"\nSaved per worker: {eager['seconds'] - lazy['seconds']:.2f}s, {eager['rss_mb'] - lazy['rss_mb']:.1f} MB")
@@ -0,0 +1,154 @@
+"""
+MarketData query benchmark.
+
+Builds a throwaway SQLite database with the pre-0001 market_data schema (no
+secondary indexes, no observed_on), fills it with synthetic price history,
+times the queries the app runs, then applies migration 0001 and times them again.
+
+    python bench_market_data.py                  # 1,000,000 rows
+    python bench_market_data.py --rows 200000 --repeat 10
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from flask import Flask
+from sqlalchemy import func, text
+
+import market_series
+import migrations
+from models import db, MarketData
+
+COMMODITIES = [f"Commodity {i:02d}" for i in range(20)]
+REGIONS = ['Rift Valley', 'Central', 'Nyanza', 'Western', 'Coast', 'Eastern', 'Nairobi', 'North Eastern']
+FIRST_DAY = date(2021, 1, 1)
+CHUNK = 50000
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def build_legacy_table(engine, rows):
+    """Today's models minus migration 0001, i.e. what an existing farmerman.db looks like."""
+    db.create_all()
+    migrations.upgrade(engine)
+    migrations.downgrade(engine)
+
+    rng = random.Random(7)
+    days = 5 * 365
+    # Plain SQL: the ORM table would also fill observed_on, which the legacy schema lacks
+    insert = text("INSERT INTO market_data (commodity, region, price, currency, trend, updated_at, posted_by) "
+                  "VALUES (:commodity, :region, :price, :currency, :trend, :updated_at, :posted_by)")
+    with engine.begin() as conn:
+        for offset in range(0, rows, CHUNK):
+            batch = []
+            for _ in range(min(CHUNK, rows - offset)):
+                day = FIRST_DAY + timedelta(days=rng.randrange(days))
+                batch.append({
+                    'commodity': rng.choice(COMMODITIES),
+                    'region': rng.choice(REGIONS),
+                    'price': round(rng.uniform(1000, 6000), 2),
+                    'currency': 'KES',
+                    'trend': 'stable',
+                    'updated_at': str(datetime.combine(day, datetime.min.time()) + timedelta(minutes=rng.randrange(1440))),
+                    'posted_by': 1
+                })
+            conn.execute(insert, batch)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def query_plan(engine, sql):
+    with engine.connect() as conn:
+        return '; '.join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+
+
+# The queries main.py runs against market_data, in forms that work on both schemas
+COMMODITY, REGION = COMMODITIES[3], REGIONS[0]
+WINDOW_START = datetime(2024, 1, 1)
+WINDOW_END = datetime(2024, 3, 31, 23, 59, 59)
+
+QUERIES = {
+    'trends_forecasts (commodity)': (
+        lambda: MarketData.query.with_entities(MarketData.updated_at, MarketData.price).filter_by(commodity=COMMODITY).all(),
+        f"SELECT updated_at, price FROM market_data WHERE commodity = '{COMMODITY}'"
+    ),
+    'live_market_prices (first 100 by commodity)': (
+        lambda: MarketData.query.with_entities(MarketData.commodity, MarketData.region, MarketData.price)
+        .order_by(MarketData.commodity.asc()).limit(100).all(),
+        "SELECT commodity, region, price FROM market_data ORDER BY commodity LIMIT 100"
+    ),
+    'one region, 90 days': (
+        lambda: MarketData.query.with_entities(MarketData.price).filter(
+            MarketData.commodity == COMMODITY, MarketData.region == REGION,
+            MarketData.updated_at.between(WINDOW_START, WINDOW_END)).all(),
+        f"SELECT price FROM market_data WHERE commodity = '{COMMODITY}' AND region = '{REGION}' "
+        f"AND updated_at BETWEEN '{WINDOW_START}' AND '{WINDOW_END}'"
+    ),
+    'ETag check (newest row of a series)': (
+        lambda: MarketData.query.with_entities(func.max(MarketData.updated_at)).filter(
+            MarketData.commodity == COMMODITY, MarketData.region == REGION).scalar(),
+        f"SELECT max(updated_at) FROM market_data WHERE commodity = '{COMMODITY}' AND region = '{REGION}'"
+    ),
+}
+
+
+def run_queries(engine, repeat):
+    return {name: (timed(fn, repeat), query_plan(engine, sql)) for name, (fn, sql) in QUERIES.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark market_data queries before and after migration 0001.")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    app = make_app(path)
+    try:
+        with app.app_context():
+            engine = db.engine
+            started = time.perf_counter()
+            build_legacy_table(engine, args.rows)
+            print(f"Loaded {args.rows:,} rows in {time.perf_counter() - started:.1f}s")
+
+            before = run_queries(engine, args.repeat)
+
+            started = time.perf_counter()
+            migrations.upgrade(engine)
+            print(f"Migration 0001 (add observed_on, backfill, build indexes) took {time.perf_counter() - started:.1f}s\n")
+
+            after = run_queries(engine, args.repeat)
+
+            print(f"{'query':<46}{'before (ms)':>12}{'after (ms)':>12}{'speed-up':>10}")
+            for name in QUERIES:
+                b, a = before[name][0], after[name][0]
+                print(f"{name:<46}{b:>12.1f}{a:>12.1f}{b / a if a else 0:>9.1f}x")
+
+            print("\nQuery plans after migration:")
+            for name in QUERIES:
+                print(f"  {name}: {after[name][1]}")
+
+            start, end = date(2024, 1, 1), date(2024, 12, 31)
+            weekly = timed(lambda: market_series.price_series(MarketData, COMMODITY, REGION, start, end, 'week'), args.repeat)
+            version = timed(lambda: market_series.series_version(MarketData, COMMODITY, REGION, start, end, 'week'), args.repeat)
+            print(f"\n/api/market-prices/series, one year weekly: {weekly:.1f} ms (ETag check alone: {version:.1f} ms)")
+    finally:
+        os.unlink(path)
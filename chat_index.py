@@ -0,0 +1,96 @@
+"""
+Per-user index of chat rooms, maintained on every message.
+
+    chat_index/{uid}/{other_uid} -> {room, last_at, unread}
+
+The chat sidebar and contacts API read only the caller's own branch, so opening
+the chat page costs O(my contacts) instead of downloading every room and message.
+"""
+from datetime import datetime, timedelta, timezone
+
+INDEX_ROOT = 'chat_index'
+
+# Firebase push ids start with the creation time (ms) in this base-64 alphabet
+PUSH_CHARS = '-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz'
+
+# last_at is written in East Africa Time, like every other chat timestamp
+EAT = timezone(timedelta(hours=3))
+
+
+def room_id(uid1, uid2):
+    return f"room_{min(str(uid1), str(uid2))}_{max(str(uid1), str(uid2))}"
+
+
+def push_key_time(key):
+    """Creation time encoded in a push id, formatted like last_at."""
+    millis = 0
+    for ch in key[:8]:
+        millis = millis * 64 + PUSH_CHARS.index(ch)
+    return datetime.fromtimestamp(millis / 1000, EAT).strftime("%Y-%m-%d %H:%M:%S")
+
+
+# Server-side increment: applied atomically by Firebase, no read or retry loop needed
+INCREMENT = {'.sv': {'increment': 1}}
+
+
+def record_message(rtdb, sender_id, receiver_id, sent_at):
+    """Touches both participants' entries and bumps the receiver's unread count in one multi-path write."""
+    room = room_id(sender_id, receiver_id)
+    rtdb.reference(INDEX_ROOT).update({
+        f'{sender_id}/{receiver_id}/room': room,
+        f'{sender_id}/{receiver_id}/last_at': sent_at,
+        f'{receiver_id}/{sender_id}/room': room,
+        f'{receiver_id}/{sender_id}/last_at': sent_at,
+        f'{receiver_id}/{sender_id}/unread': INCREMENT
+    })
+
+
+def reset_unread(rtdb, uid, other_uid):
+    rtdb.reference(f'{INDEX_ROOT}/{uid}/{other_uid}/unread').set(0)
+
+
+def load_chat_index(rtdb, uid):
+    return rtdb.reference(f'{INDEX_ROOT}/{uid}').get() or {}
+
+
+def contact_uids(rtdb, uid):
+    """Everyone this user has a room with (keys only)."""
+    return set((rtdb.reference(f'{INDEX_ROOT}/{uid}').get(shallow=True) or {}).keys())
+
+
+def sorted_contacts(index):
+    """Unread conversations first, then most recent activity."""
+    return sorted(index.items(),
+                  key=lambda item: ((item[1].get('unread') or 0) > 0, item[1].get('last_at', '')),
+                  reverse=True)
+
+
+def rebuild_chat_index(rtdb):
+    """
+    Backfills chat_index from existing rooms and the old unread_counts node.
+    Reads only each room's newest key, never the messages themselves.
+    """
+    rooms = rtdb.reference('chats').get(shallow=True) or {}
+    unread_counts = rtdb.reference('unread_counts').get() or {}
+    tree = {}
+    for room in rooms:
+        parts = room[len('room_'):].split('_', 1)
+        if len(parts) != 2:
+            continue
+        latest = rtdb.reference(f'chats/{room}').order_by_key().limit_to_last(1).get() or {}
+        last_at = push_key_time(next(iter(latest))) if latest else ''
+        a, b = parts
+        for uid, other in ((a, b), (b, a)):
+            tree.setdefault(uid, {})[other] = {
+                'room': room,
+                'last_at': last_at,
+                'unread': (unread_counts.get(uid) or {}).get(other, 0)
+            }
+    rtdb.reference(INDEX_ROOT).set(tree)
+    return len(rooms)
+
+
+if __name__ == "__main__":
+    from main import rtdb
+    total = rebuild_chat_index(rtdb)
+    print(f"Successfully indexed {total} chat rooms under '{INDEX_ROOT}'.")
@@ -0,0 +1,134 @@
+"""
+Region-level climate alerts.
+
+Alerts depend only on the weather, and everyone in a region shares the same
+weather, so they are computed once per region and stored once per region:
+
+    climate_regions/{region}          -> region name, as reported by a user's browser
+    climate_alerts_by_region/{region} -> {region, generated_at, reading, alerts: [...]}
+
+A scheduled job fetches every known region from OpenWeather and refreshes them
+all in one bulk rule evaluation and one multi-path write. Readings posted by a
+browser only ever produce that user's own alerts (climate_alerts/{uid}), so one
+bad post can't rewrite a whole region. Users reference their region from their
+profile (climate_region, falling back to location), so the climate hub is a
+single small read.
+"""
+from datetime import datetime
+
+import requests
+
+from user_index import index_key
+
+REGIONS_ROOT = 'climate_regions'
+ALERTS_ROOT = 'climate_alerts_by_region'
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+OPENWEATHER_URL = 'https://api.openweathermap.org/data/2.5/weather'
+
+
+def region_key(region):
+    return index_key(region)
+
+
+def user_region(profile):
+    """The alerts region a user follows: the last region their browser reported, else their profile location."""
+    profile = profile or {}
+    return profile.get('climate_region') or region_key(profile.get('location'))
+
+
+def register_region(rtdb, region):
+    """Adds a browser-reported region to the scheduled refresh (name only, never the reading)."""
+    key = region_key(region)
+    if not key:
+        return None
+    ref = rtdb.reference(f'{REGIONS_ROOT}/{key}')
+    if ref.get() is None:
+        ref.set(region)
+    return key
+
+
+def fetch_region_weather(region, api_key, timeout=10):
+    """Current weather for a region name from OpenWeather, in the same shape the browser posts."""
+    try:
+        resp = requests.get(OPENWEATHER_URL, params={'q': region, 'units': 'metric', 'appid': api_key}, timeout=timeout)
+        if resp.status_code != 200:
+            return None
+        data = resp.json()
+        return {
+            'temp': data['main']['temp'],
+            'humidity': data['main']['humidity'],
+            'wind': round(data['wind']['speed'] * 3.6, 1),
+            'condition': data['weather'][0]['main'],
+            'region': data.get('name') or region
+        }
+    except Exception as e:
+        print(f"Weather fetch failed for {region}: {e}")
+        return None
+
+
+def compute_region_alerts(rtdb, readings):
+    """
+    Evaluates every region's reading in one bulk pass and writes all of them
+    with a single multi-path update. readings: { region_key: reading }.
+    """
+    if not readings:
+        return 0
+    # NumPy is loaded with the rule engine, on the first run rather than at boot
+    from climate_rules import default_rules
+
+    keys = list(readings)
+    rows = [readings[k] for k in keys]
+    alerts = default_rules().evaluate_bulk(
+        [float(r.get('temp', 0)) for r in rows],
+        [float(r.get('humidity', 0)) for r in rows],
+        [float(r.get('wind', 0)) for r in rows],
+        [str(r.get('condition', '')) for r in rows],
+        [str(r.get('region', k)) for k, r in zip(keys, rows)]
+    )
+    generated_at = datetime.now().strftime(TIME_FORMAT)
+    rtdb.reference(ALERTS_ROOT).update({
+        key: {
+            'region': row.get('region', key),
+            'generated_at': generated_at,
+            'reading': {f: row.get(f) for f in ('temp', 'humidity', 'wind', 'condition')},
+            'alerts': region_alerts
+        }
+        for key, row, region_alerts in zip(keys, rows, alerts)
+    })
+    return len(keys)
+
+
+def known_regions(rtdb):
+    """{ region_key: name to query } for regions users live in (location index) plus any a browser has reported."""
+    regions = {key: key for key in (rtdb.reference('user_index/by_location').get(shallow=True) or {})}
+    regions.update(rtdb.reference(REGIONS_ROOT).get() or {})
+    regions.pop('', None)
+    return regions
+
+
+def run_region_alerts(rtdb, api_key=None, on_fetch=None):
+    """
+    Scheduled refresh: one OpenWeather reading per known region, then one bulk
+    evaluation and write. Without an API key there is nothing trustworthy to
+    compute from, so regions are left as they are.
+    on_fetch(region_key, reading) is called for each fetched reading.
+    """
+    if not api_key:
+        return 0
+    readings = {}
+    for key, name in known_regions(rtdb).items():
+        reading = fetch_region_weather(name, api_key)
+        if reading is None:
+            continue
+        if on_fetch:
+            on_fetch(key, reading)
+        readings[key] = reading
+    return compute_region_alerts(rtdb, readings)
+
+
+def load_region_alerts(rtdb, key):
+    if not key:
+        return []
+    node = rtdb.reference(f'{ALERTS_ROOT}/{key}').get() or {}
+    return [a for a in (node.get('alerts') or []) if a]
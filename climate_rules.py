@@ -0,0 +1,181 @@
+"""
+Table-driven climate rule engine.
+
+The agronomic rules live in data/climate_rules.json so they can be edited without
+touching code. A RuleSet compiles them once into NumPy comparisons, then scores a
+whole array of readings (stations, regions, hours) in a single call:
+
+    rules = default_rules()
+    alerts = rules.evaluate_bulk(temps, humidities, winds, conditions, regions)
+
+logic.analyze_weather_and_generate_alerts is the single-reading wrapper.
+"""
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'climate_rules.json')
+
+NUMERIC_FIELDS = ('temp', 'humidity', 'wind_speed')
+TEXT_FIELD = 'condition'
+
+NUMERIC_OPS = {
+    '<': np.less,
+    '<=': np.less_equal,
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '==': np.equal,
+}
+TEXT_OPS = ('contains_any', 'contains_none')
+
+
+def load_rules(path=RULES_FILE):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['rules']
+
+
+class RuleSet:
+    def __init__(self, rules):
+        self.rules = [self._validate(rule) for rule in rules]
+        # Advice without placeholders is reused as-is instead of being re-formatted per reading
+        self._needs_format = ['{' in rule['advice'] for rule in self.rules]
+
+    @classmethod
+    def from_file(cls, path=RULES_FILE):
+        return cls(load_rules(path))
+
+    @staticmethod
+    def _validate(rule):
+        for key in ('id', 'title', 'alert_type', 'advice'):
+            if key not in rule:
+                raise ValueError(f"Climate rule {rule.get('id', '?')} is missing '{key}'")
+        for cond in rule.get('when', []):
+            field, op = cond.get('field'), cond.get('op')
+            if field in NUMERIC_FIELDS and (op in NUMERIC_OPS or op == 'between'):
+                continue
+            if field == TEXT_FIELD and op in TEXT_OPS:
+                continue
+            raise ValueError(f"Climate rule {rule['id']}: unsupported condition {field} {op}")
+        return rule
+
+    def match(self, temp, humidity, wind_speed, condition):
+        """
+        Boolean matrix (readings x rules) of which alerts fire for each reading,
+        with group (if/elif), suppression and fallback semantics applied.
+        """
+        columns = {
+            'temp': np.atleast_1d(np.asarray(temp, dtype=float)),
+            'humidity': np.atleast_1d(np.asarray(humidity, dtype=float)),
+            'wind_speed': np.atleast_1d(np.asarray(wind_speed, dtype=float)),
+        }
+        n = len(columns['temp'])
+        text = np.char.lower(np.atleast_1d(np.asarray(condition, dtype=str)))
+        if len(text) == 1 and n > 1:
+            text = np.repeat(text, n)
+        contains = {}
+
+        def has(word):
+            if word not in contains:
+                contains[word] = np.char.find(text, word) >= 0
+            return contains[word]
+
+        fired = np.zeros((n, len(self.rules)), dtype=bool)
+        group_taken = {}
+        for r, rule in enumerate(self.rules):
+            if rule.get('fallback'):
+                continue
+            mask = np.ones(n, dtype=bool)
+            for cond in rule.get('when', []):
+                field, op, value = cond['field'], cond['op'], cond['value']
+                if field == TEXT_FIELD:
+                    any_word = np.zeros(n, dtype=bool)
+                    for word in value:
+                        any_word |= has(word)
+                    mask &= any_word if op == 'contains_any' else ~any_word
+                elif op == 'between':
+                    mask &= (columns[field] >= value[0]) & (columns[field] <= value[1])
+                else:
+                    mask &= NUMERIC_OPS[op](columns[field], value)
+
+            suppressors = rule.get('suppressed_by')
+            if suppressors:
+                earlier = [j for j in range(r) if self.rules[j]['alert_type'] in suppressors]
+                if earlier:
+                    mask &= ~fired[:, earlier].any(axis=1)
+
+            group = rule.get('group')
+            if group:
+                taken = group_taken.setdefault(group, np.zeros(n, dtype=bool))
+                mask &= ~taken
+                taken |= mask
+            fired[:, r] = mask
+
+        fallbacks = [r for r, rule in enumerate(self.rules) if rule.get('fallback')]
+        if fallbacks:
+            nothing = ~fired.any(axis=1)
+            for r in fallbacks:
+                fired[:, r] = nothing
+        return fired
+
+    def _alert(self, r, values, timestamp, region):
+        rule = self.rules[r]
+        advice = rule['advice'].format(**values) if self._needs_format[r] else rule['advice']
+        return {
+            'title': rule['title'],
+            'advice': advice,
+            'alert_type': rule['alert_type'],
+            'timestamp': timestamp,
+            'region': region
+        }
+
+    def evaluate_one(self, temp, humidity, wind_speed, condition, region, timestamp=None):
+        """Alerts for one reading; advice text uses the values exactly as passed in."""
+        timestamp = timestamp or datetime.now().strftime("%b %d, %H:%M")
+        fired = self.match(temp, humidity, wind_speed, condition)[0]
+        values = {'temp': temp, 'humidity': humidity, 'wind_speed': wind_speed}
+        return [self._alert(r, values, timestamp, region) for r in np.flatnonzero(fired)]
+
+    def evaluate_bulk(self, temp, humidity, wind_speed, condition, region, timestamp=None):
+        """
+        Alerts for many readings at once. Arguments are equal-length sequences
+        (condition and region may also be single values shared by every reading).
+        :return: one alert list per reading, in input order
+        """
+        timestamp = timestamp or datetime.now().strftime("%b %d, %H:%M")
+        fired = self.match(temp, humidity, wind_speed, condition)
+        # The float arrays are only for the masks; advice shows each value as passed in (2 -> "2°C", not "2.0°C")
+        temps, humidities, winds = _as_list(temp), _as_list(humidity), _as_list(wind_speed)
+        regions = [region] * len(temps) if isinstance(region, str) else list(region)
+
+        results = [[] for _ in temps]
+        rows, cols = np.nonzero(fired)  # row-major: each reading's rules come out in table order
+        for i, r in zip(rows.tolist(), cols.tolist()):
+            values = {'temp': temps[i], 'humidity': humidities[i], 'wind_speed': winds[i]}
+            results[i].append(self._alert(r, values, timestamp, regions[i]))
+        return results
+
+
+def _as_list(values):
+    if np.ndim(values) == 0:
+        return [values]
+    return values.tolist() if isinstance(values, np.ndarray) else list(values)
+
+
+_default = None
+
+
+def default_rules():
+    """The RuleSet from data/climate_rules.json, compiled on first use."""
+    global _default
+    if _default is None:
+        _default = RuleSet.from_file()
+    return _default
+
+
+def reload_rules():
+    """Re-reads data/climate_rules.json after agronomists edit it."""
+    global _default
+    _default = RuleSet.from_file()
+    return _default
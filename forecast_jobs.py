@@ -0,0 +1,149 @@
+"""
+Offline batch forecasting.
+
+Collects every (commodity, region) price series from SQLite MarketData and the
+RTDB 'market_data' node, forecasts them all in one batch (the vectorized NumPy
+engine in ai_logic, or per-series RandomForests in a process pool), and writes the results under 'forecasts/{series_key}' so request handlers only
+ever read a finished forecast.
+"""
+import multiprocessing
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from user_index import index_key
+
+FORECASTS_ROOT = 'forecasts'
+ALL_REGIONS = 'All Regions'
+MIN_HISTORY = 5
+# ForecastService uses the same engine for its inline fallback
+DEFAULT_ENGINE = 'vectorized'
+
+
+def series_key(commodity, region=None):
+    return index_key(f"{commodity}|{region or ALL_REGIONS}").replace(' ', '_')
+
+
+def _parse_timestamp(value):
+    """market_data rows carry either 'YYYY-mm-dd HH:MM:SS' strings or RTDB server timestamps (ms)."""
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value / 1000)
+    try:
+        return datetime.strptime(str(value)[:19], "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return None
+
+
+def collect_sqlite_series(market_data_model):
+    """
+    { (commodity, region): [{'date', 'price'}] } for every MarketData series, plus an all-regions series per commodity.
+    Points are dated by observed_on: updated_at moves whenever a row is edited.
+    """
+    series = defaultdict(list)
+    rows = market_data_model.query.with_entities(
+        market_data_model.commodity, market_data_model.region,
+        market_data_model.observed_on, market_data_model.price
+    ).all()
+    for commodity, region, observed_on, price in rows:
+        point = {'date': observed_on, 'price': price}
+        series[(commodity, region)].append(point)
+        series[(commodity, None)].append(point)
+    return series
+
+
+def collect_rtdb_series(rtdb):
+    series = defaultdict(list)
+    for item in (rtdb.reference('market_data').get() or {}).values():
+        if not isinstance(item, dict) or not item.get('commodity'):
+            continue
+        date = _parse_timestamp(item.get('updated_at'))
+        try:
+            price = float(item.get('price'))
+        except (TypeError, ValueError):
+            continue
+        if date:
+            series[(item['commodity'].strip(), (item.get('region') or '').strip() or None)].append({'date': date, 'price': price})
+    return series
+
+
+def _forecast_series(job):
+    """Runs in a worker process: job = (commodity, region, history, days_to_predict)."""
+    # Imported here so the web workers never load the forecasting stack for this module
+    from ai_logic.ai_engine import generate_price_forecast
+
+    commodity, region, history, days_to_predict = job
+    try:
+        result = generate_price_forecast(history, days_to_predict)
+    except Exception as e:
+        result = {"error": str(e)}
+    if 'predicted_prices' in result:
+        # numpy floats don't survive the trip into RTDB's JSON
+        result['predicted_prices'] = [float(p) for p in result['predicted_prices']]
+    return commodity, region, result
+
+
+def _forecast_vectorized(series, days_to_predict):
+    """Forecasts every series in one NumPy pass with the batched trend engine."""
+    from ai_logic.preprocess import to_long_frame
+    from ai_logic.predict import forecast_many
+
+    forecasts = forecast_many(to_long_frame(series), days_to_predict, min_points=MIN_HISTORY)
+    return [(commodity, region, forecast) for (commodity, region), forecast in forecasts.items()]
+
+
+def _forecast_in_pool(jobs, max_workers):
+    """Trains one RandomForest per series across a process pool."""
+    # 'spawn' gives the pool clean interpreters instead of forking a gevent-patched worker
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return list(pool.map(_forecast_series, jobs, chunksize=8))
+
+
+def run_batch_forecasts(app, rtdb, market_data_model, days_to_predict=7, max_workers=None, engine=DEFAULT_ENGINE):
+    """
+    Forecasts every series with enough history and stores the results in RTDB.
+    engine='vectorized' uses the batched NumPy trend engine (seconds for hundreds of series);
+    engine='random_forest' trains the per-series RandomForest in a process pool.
+    """
+    started = time.perf_counter()
+    with app.app_context():
+        series = collect_sqlite_series(market_data_model)
+    for key, points in collect_rtdb_series(rtdb).items():
+        # RTDB copies of the same series are merged in; the model sorts by date anyway
+        series[key].extend(points)
+
+    series = {key: points for key, points in series.items() if len(points) >= MIN_HISTORY}
+    if engine == 'random_forest':
+        jobs = [(commodity, region, points, days_to_predict) for (commodity, region), points in series.items()]
+        forecasts = _forecast_in_pool(jobs, max_workers) if jobs else []
+    else:
+        forecasts = _forecast_vectorized(series, days_to_predict) if series else []
+
+    generated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    results = {}
+    for commodity, region, forecast in forecasts:
+        results[series_key(commodity, region)] = {
+            'commodity': commodity,
+            'region': region or ALL_REGIONS,
+            'horizon_days': days_to_predict,
+            'generated_at': generated_at,
+            'engine': engine,
+            **forecast
+        }
+    if results:
+        rtdb.reference(FORECASTS_ROOT).update(results)
+
+    elapsed = time.perf_counter() - started
+    print(f"Batch forecasts ({engine}): {len(results)} series in {elapsed:.1f}s")
+    return results
+
+
+def get_forecast(rtdb, commodity, region=None):
+    """Reads one precomputed forecast, or None if the batch job hasn't produced it yet."""
+    return rtdb.reference(f'{FORECASTS_ROOT}/{series_key(commodity, region)}').get()
+
+
+if __name__ == "__main__":
+    from main import app, rtdb
+    from models import MarketData
+    run_batch_forecasts(app, rtdb, MarketData)
@@ -0,0 +1,97 @@
+import threading
+from collections import OrderedDict
+
+from forecast_jobs import DEFAULT_ENGINE, MIN_HISTORY
+
+DEFAULT_MAX_MODELS = 64
+
+
+def data_version(records):
+    """
+    Cheap fingerprint of a MarketData series: row count, newest id and newest timestamp.
+    It only changes when rows are added, removed or edited, which is exactly when
+    a cached model goes stale. updated_at is used here because edits bump it; the
+    model itself dates each price by observed_on.
+    """
+    if not records:
+        return (0, None, None)
+    return (len(records), max(r.id for r in records), max(r.updated_at for r in records))
+
+
+class ForecastService:
+    """
+    Trains one price model per (commodity, region, data_version) and reuses it.
+    Forecasts for each horizon are memoised alongside the fitted model.
+    engine matches run_batch_forecasts, so a chart gets the same model whether its
+    forecast came from the nightly job or was computed inline.
+    """
+
+    def __init__(self, max_models=DEFAULT_MAX_MODELS, engine=DEFAULT_ENGINE):
+        self.max_models = max_models
+        self.engine = engine
+        self._models = OrderedDict()  # { (commodity, region): (version, trained, {days: forecast}) }
+        self._lock = threading.Lock()
+        self.trainings = 0
+        self.hits = 0
+
+    def forecast(self, commodity, region, records, days_to_predict=7):
+        """Returns the Chart.js-ready forecast for this series, retraining only if its data changed."""
+        series_key = (commodity, region)
+        version = data_version(records)
+
+        with self._lock:
+            cached = self._models.get(series_key)
+            if cached and cached[0] == version:
+                self._models.move_to_end(series_key)
+                if days_to_predict in cached[2]:
+                    self.hits += 1
+                    return cached[2][days_to_predict]
+                trained = cached[1]
+            else:
+                trained = None
+
+        if trained is None:
+            history = [{'date': r.observed_on, 'price': r.price} for r in records]
+            trained = self._train(history)
+            self.trainings += 1
+
+        result = self._predict(trained, days_to_predict)
+
+        with self._lock:
+            cached = self._models.get(series_key)
+            forecasts = cached[2] if cached and cached[0] == version else {}
+            forecasts[days_to_predict] = result
+            # A new version replaces the stale model for this series outright
+            self._models[series_key] = (version, trained, forecasts)
+            self._models.move_to_end(series_key)
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+        return result
+
+    # pandas / NumPy / scikit-learn are loaded on first forecast, not when the web worker boots
+    def _train(self, history):
+        if self.engine == 'random_forest':
+            from ai_logic.ai_engine import train_price_model
+            return train_price_model(history)
+        # The trend engine fits as it predicts; the "model" is the history it fits on
+        return history
+
+    def _predict(self, trained, days_to_predict):
+        if self.engine == 'random_forest':
+            from ai_logic.ai_engine import predict_prices
+            return predict_prices(trained, days_to_predict)
+        from ai_logic.preprocess import to_long_frame
+        from ai_logic.predict import forecast_many
+        return forecast_many(to_long_frame({0: trained}), days_to_predict, min_points=MIN_HISTORY)[0]
+
+    def invalidate(self, commodity=None, region=None):
+        with self._lock:
+            if commodity is None:
+                self._models.clear()
+                return
+            for key in [k for k in self._models if k[0] == commodity and (region is None or k[1] == region)]:
+                del self._models[key]
+
+    def stats(self):
+        with self._lock:
+            return {'models': len(self._models), 'trainings': self.trainings, 'hits': self.hits}
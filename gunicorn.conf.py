@@ -0,0 +1,12 @@
+"""
+Gunicorn settings, read automatically from the working directory (gunicorn main:app).
+
+Each worker imports main.py for the app; the scheduled jobs are started here, once
+the worker is up, so only web workers ever compete for the scheduler lock.
+"""
+
+
+def post_worker_init(worker):
+    from main import start_scheduler
+    if start_scheduler():
+        print(f"Worker {worker.pid} is running the scheduled jobs")
@@ -0,0 +1,41 @@
+import threading
+import time
+from datetime import datetime
+
+
+class StartupHealth:
+    """
+    Background Firebase connectivity check.
+    Reads a single user key (constant cost however big 'users' grows) so worker boot never waits on it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = {'status': 'pending', 'checked_at': None, 'latency_ms': None, 'error': None}
+
+    def check(self, rtdb):
+        started = time.perf_counter()
+        try:
+            if rtdb is None:
+                raise RuntimeError("Firebase was not initialized")
+            rtdb.reference('users').order_by_key().limit_to_first(1).get()
+            state = {'status': 'ok', 'error': None}
+        except Exception as e:
+            state = {'status': 'error', 'error': str(e)}
+        state['latency_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        state['checked_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        with self._lock:
+            self._state = state
+        if state['status'] == 'ok':
+            print(f"Connection Verified: Firebase responded in {state['latency_ms']}ms.")
+        else:
+            print(f"Warning: Firebase connection check failed: {state['error']}")
+        return state
+
+    def check_in_background(self, rtdb):
+        threading.Thread(target=self.check, args=(rtdb,), daemon=True).start()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._state)
@@ -0,0 +1,50 @@
+"""
+Single-leader election for the background scheduler.
+
+Every gunicorn worker imports main.py, but only one of them should run the
+scheduled jobs. Whoever takes the exclusive lock on the lock file is the leader;
+the OS releases it when that process exits, so the next worker to boot takes over.
+
+file_lock() is the blocking variant for one-off startup steps (schema
+migrations) that every worker must wait for but only one may run at a time.
+"""
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: a single process, so it is always the leader
+    fcntl = None
+
+
+def acquire_leader_lock(path):
+    """Returns the open lock file if this process is the leader, otherwise None."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    handle = open(path, 'a+')
+    if fcntl is None:
+        return handle
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    handle.seek(0)
+    handle.truncate()
+    handle.write(str(os.getpid()))
+    handle.flush()
+    return handle
+
+
+@contextmanager
+def file_lock(path):
+    """Blocks until this process holds the exclusive lock on path; released on exit."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a+') as handle:
+        if fcntl is None:
+            yield handle
+            return
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield handle
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
@@ -0,0 +1,101 @@
+"""
+Precomputed academy leaderboard.
+
+    leaderboard/{uid} -> {'name': str, 'points': int}
+
+Points are awarded once per course, the first time update_progress reaches 100%
+(user_progress/{uid}/{course}/points_awarded records it).
+Reads are indexed queries on points (.indexOn in database.rules.json): "top N" is
+order_by_child('points').limit_to_last(N), and "my rank" only reads the entries
+at or above my own score. Nothing is held in memory, so every worker sees awards
+made on the others straight away.
+"""
+LEADERBOARD_ROOT = 'leaderboard'
+POINTS_PER_COURSE = 100
+
+# Legacy clients, new buyers, and new sellers appear on the board
+ELIGIBLE_ROLES = ('client', 'buyer', 'seller')
+
+
+def _ranked(snapshot):
+    """[(uid, entry)] best first; ties go to the lower uid."""
+    entries = [(uid, e) for uid, e in (snapshot or {}).items() if isinstance(e, dict) and int(e.get('points', 0)) > 0]
+    return sorted(entries, key=lambda item: (-int(item[1]['points']), item[0]))
+
+
+class Leaderboard:
+    def __init__(self, rtdb):
+        self._rtdb = rtdb
+
+    def _ref(self):
+        return self._rtdb.reference(LEADERBOARD_ROOT)
+
+    def award_course_completion(self, uid, name):
+        """Adds POINTS_PER_COURSE to an eligible user in one transaction."""
+        def apply(current):
+            current = current if isinstance(current, dict) else {}
+            return {'name': name, 'points': int(current.get('points', 0)) + POINTS_PER_COURSE}
+
+        return self._rtdb.reference(f'{LEADERBOARD_ROOT}/{uid}').transaction(apply)
+
+    def top(self, n=10):
+        snapshot = self._ref().order_by_child('points').limit_to_last(n).get()
+        return [{'uid': uid, 'name': e.get('name', 'Anonymous Farmer'), 'points': int(e['points'])}
+                for uid, e in _ranked(snapshot)]
+
+    def rank_of(self, uid):
+        """Returns {'rank': int, 'points': int} for uid, or None if they have no points yet."""
+        if not uid:
+            return None
+        entry = self._rtdb.reference(f'{LEADERBOARD_ROOT}/{uid}').get()
+        if not isinstance(entry, dict) or int(entry.get('points', 0)) <= 0:
+            return None
+        points = int(entry['points'])
+        # Only the entries scoring at least as much as this user are downloaded
+        ahead = self._ref().order_by_child('points').start_at(points).get() or {}
+        rank = 1 + sum(1 for other, e in _ranked(ahead)
+                       if other != uid and (int(e['points']) > points or other < uid))
+        return {'rank': rank, 'points': points}
+
+
+def course_awarded(course_data):
+    """A course earns points once it has reached 100%, even if progress later dropped back."""
+    return isinstance(course_data, dict) and (
+        bool(course_data.get('points_awarded')) or int(course_data.get('progress', 0)) >= 100)
+
+
+def rebuild_leaderboard(rtdb):
+    """
+    Recomputes every user's points from user_progress. Runs as a job (or by hand), never
+    in a request. Each user is merged in with a transaction that keeps the higher score,
+    so an award committed on a web worker while this runs is never overwritten.
+    """
+    # Read 'users' directly: user_index may not have been backfilled yet, and an
+    # empty board written here would never be rebuilt once the first award lands
+    all_users = rtdb.reference('users').get() or {}
+    all_progress = rtdb.reference('user_progress').get() or {}
+
+    board = {}
+    for uid, user_data in all_users.items():
+        if not isinstance(user_data, dict) or str(user_data.get('role', 'buyer')).lower() not in ELIGIBLE_ROLES:
+            continue
+        completed = sum(1 for course_data in (all_progress.get(uid) or {}).values() if course_awarded(course_data))
+        if completed:
+            board[uid] = {'name': user_data.get('full_name', 'Anonymous Farmer'), 'points': completed * POINTS_PER_COURSE}
+
+    for uid, entry in board.items():
+        def merge(current, entry=entry):
+            current = current if isinstance(current, dict) else {}
+            return {'name': entry['name'], 'points': max(int(current.get('points', 0)), entry['points'])}
+        rtdb.reference(f'{LEADERBOARD_ROOT}/{uid}').transaction(merge)
+    return board
+
+
+def is_empty(rtdb):
+    return not rtdb.reference(LEADERBOARD_ROOT).order_by_key().limit_to_first(1).get()
+
+
+if __name__ == "__main__":
+    from main import rtdb
+    board = rebuild_leaderboard(rtdb)
+    print(f"Leaderboard rebuilt with {len(board)} ranked learners.")
@@ -0,0 +1,172 @@
+"""
+Outbound email queue.
+
+A bounded queue drained by a fixed pool of workers. Each worker keeps one SMTP
+connection open and reuses it for every message it sends, so a burst of signups
+costs a handful of handshakes instead of one thread and one login per email.
+
+    mailer = EmailQueue.from_config(app.config)
+    mailer.submit(build_message(subject, to, html, sender=...))
+    mailer.stats()  # queue depth, sent / failed / retried counts, latency
+"""
+import queue
+import smtplib
+import threading
+import time
+from collections import deque
+from email.message import EmailMessage
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_QUEUE = 1000
+DEFAULT_BATCH_SIZE = 20
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_SECONDS = 2.0
+# Reconnect rather than trust a connection the server has probably timed out
+IDLE_RECONNECT_SECONDS = 60
+LATENCY_WINDOW = 500
+
+
+def build_message(subject, to, html, sender, text=None):
+    msg = EmailMessage()
+    msg['Subject'] = subject
+    msg['From'] = sender
+    msg['To'] = to
+    msg.set_content(text or "This message is best viewed in an HTML-capable email client.")
+    msg.add_alternative(html, subtype='html')
+    return msg
+
+
+class _Connection:
+    """One worker's reusable SMTP session."""
+
+    def __init__(self, mailer):
+        self.mailer = mailer
+        self.server = None
+        self.last_used = 0.0
+
+    def get(self):
+        if self.server is not None and time.time() - self.last_used > IDLE_RECONNECT_SECONDS:
+            self.close()
+        if self.server is None:
+            m = self.mailer
+            if m.use_ssl:
+                self.server = smtplib.SMTP_SSL(m.host, m.port, timeout=m.timeout)
+            else:
+                self.server = smtplib.SMTP(m.host, m.port, timeout=m.timeout)
+                if m.use_tls:
+                    self.server.starttls()
+            if m.username:
+                self.server.login(m.username, m.password)
+            m._count('connections')
+        self.last_used = time.time()
+        return self.server
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except Exception:
+                pass
+            self.server = None
+
+
+class EmailQueue:
+    def __init__(self, host, port, username=None, password=None, use_tls=True, use_ssl=False,
+                 workers=DEFAULT_WORKERS, max_queue=DEFAULT_MAX_QUEUE, batch_size=DEFAULT_BATCH_SIZE,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff_seconds=DEFAULT_BACKOFF_SECONDS, timeout=30):
+        self.host, self.port = host, port
+        self.username, self.password = username, password
+        self.use_tls, self.use_ssl = use_tls, use_ssl
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.timeout = timeout
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._started = False
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._counts = {'submitted': 0, 'sent': 0, 'failed': 0, 'retries': 0, 'dropped': 0, 'connections': 0, 'batches': 0}
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        """Builds the queue from the Flask-Mail settings already in app.config."""
+        return cls(config.get('MAIL_SERVER', 'localhost'), config.get('MAIL_PORT', 25),
+                   username=config.get('MAIL_USERNAME'), password=config.get('MAIL_PASSWORD'),
+                   use_tls=config.get('MAIL_USE_TLS', False), use_ssl=config.get('MAIL_USE_SSL', False),
+                   **kwargs)
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._counts[name] += n
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for i in range(self.workers):
+            threading.Thread(target=self._work, name=f"email-worker-{i}", daemon=True).start()
+
+    def submit(self, msg):
+        """Queues a message without blocking. Returns False if the queue is full."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((msg, time.time()))
+        except queue.Full:
+            self._count('dropped')
+            print(f"Email queue full, dropped message to {msg['To']}")
+            return False
+        self._count('submitted')
+        return True
+
+    def _next_batch(self):
+        # Block for the first message, then take whatever else is already waiting
+        batch = [self._queue.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _work(self):
+        conn = _Connection(self)
+        while True:
+            batch = self._next_batch()
+            self._count('batches')
+            for msg, queued_at in batch:
+                self._deliver(conn, msg, queued_at)
+                self._queue.task_done()
+
+    def _deliver(self, conn, msg, queued_at):
+        for attempt in range(self.max_retries + 1):
+            try:
+                conn.get().send_message(msg)
+            except Exception as e:
+                conn.close()
+                if attempt == self.max_retries:
+                    self._count('failed')
+                    print(f"Failed to send email to {msg['To']} after {attempt + 1} attempts: {e}")
+                    return
+                self._count('retries')
+                time.sleep(self.backoff_seconds * (2 ** attempt))
+                continue
+            with self._lock:
+                self._counts['sent'] += 1
+                self._latencies.append(time.time() - queued_at)
+            return
+
+    def flush(self):
+        """Blocks until every queued message has been sent or given up on."""
+        self._queue.join()
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            counts = dict(self._counts)
+        counts['queue_depth'] = self._queue.qsize()
+        counts['avg_latency_ms'] = round(sum(latencies) / len(latencies) * 1000, 1) if latencies else None
+        counts['p95_latency_ms'] = round(latencies[int((len(latencies) - 1) * 0.95)] * 1000, 1) if latencies else None
+        return counts
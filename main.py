@@ -10,20 +10,17 @@ import json
 import base64
 import stripe
 import requests
-import threading
-import smtplib
+import atexit
 import time
 import uuid # <-- Essential for generating unique cloud filenames
 from datetime import datetime, timedelta, timezone
 from functools import wraps 
-from email.message import EmailMessage
 from dotenv import load_dotenv
 from werkzeug.utils import secure_filename
 from werkzeug.exceptions import NotFound
-from logic import analyze_weather_and_generate_alerts, update_firebase_alerts
+from logic import analyze_weather_and_generate_alerts
 # Flask & Extensions
 from flask import Flask, render_template, request, redirect, url_for, jsonify, session, flash, send_from_directory, abort
-from flask_mail import Mail, Message
 from flask_socketio import SocketIO, emit, join_room, leave_room
 
 # Firebase Imports
@@ -31,12 +28,30 @@ import firebase_admin
 from firebase_admin import credentials, auth, db as firebase_db, storage # <-- Essential: Added 'storage'
 
 # Internal Project Imports
-from models import db as sqlalchemy_db, User, MarketData, Transaction 
-from ai_logic.ai_engine import generate_price_forecast
+from models import db as sqlalchemy_db, User, MarketData, Transaction
+from forecast_service import ForecastService
+from forecast_jobs import run_batch_forecasts, get_forecast, FORECASTS_ROOT
 from mpesa import initiate_stk_push
+from rtdb_cache import RTDBCache
+from health import StartupHealth
+from mailer import EmailQueue, build_message
+from leader import acquire_leader_lock
+from drip import run_drip_batch, NAME_PLACEHOLDER as DRIP_NAME_PLACEHOLDER
+from climate_pipeline import register_region, run_region_alerts, load_region_alerts, user_region, region_key as climate_region_key
+import weather_store
+import market_series
+from migrations import upgrade as run_migrations
+from presence import PresenceRegistry, PresenceFanout, backend_for
+from chat_index import record_message, reset_unread, load_chat_index, contact_uids, sorted_contacts
+from user_index import USER_ROLES, sync_user_index, users_by, users_by_roles, users_page, get_users, fresh_profile, update_user_profile
+from leaderboard import Leaderboard, ELIGIBLE_ROLES, rebuild_leaderboard, is_empty as leaderboard_is_empty
+from stats import record_revenue, record_deposit, record_withdrawal, add_pending_loan, resolve_pending_loan, load_dashboard_stats, reconcile_stats, is_reconciled
 
 # APScheduler Setup
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 
 # ==========================================
 # 1. INITIALIZATION & APP CONFIGURATION
@@ -47,7 +62,7 @@ app = Flask(__name__)
 app.secret_key = 'delstarford_works_secret_key' 
 app.config['PERMANENT_SESSION_LIFETIME'] = 86400 # 24 hours
 
-# Flask-Mail Configuration
+# SMTP settings (Flask-Mail names), read by EmailQueue.from_config
 app.config['MAIL_SERVER'] = 'smtp.gmail.com'
 app.config['MAIL_PORT'] = 587
 app.config['MAIL_USE_TLS'] = True
@@ -55,11 +70,66 @@ app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME')
 app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD')
 app.config['MAIL_DEFAULT_SENDER'] = ('Farmerman Systems', os.environ.get('MAIL_USERNAME'))
 
-mail = Mail(app)
+# Outbound email goes through one bounded queue + worker pool (pooled SMTP, retries, metrics)
+mailer = EmailQueue.from_config(app.config)
+MAIL_SENDER = f"Farmerman Systems <{app.config['MAIL_USERNAME']}>"
 
 # APScheduler Initialization
-scheduler = BackgroundScheduler()
-scheduler.start()
+# Jobs are stored in farmerman.db so schedules (and runs missed while the app was down)
+# survive restarts and deploys. Only the web worker holding the scheduler lock runs them,
+# and only once start_scheduler() is called (see the bottom of this file and gunicorn.conf.py).
+os.makedirs(app.instance_path, exist_ok=True)
+scheduler = BackgroundScheduler(
+    jobstores={'default': SQLAlchemyJobStore(url=f"sqlite:///{os.path.join(app.instance_path, 'farmerman.db')}")},
+    job_defaults={'coalesce': True, 'misfire_grace_time': 6 * 3600}
+)
+scheduler_lock = None
+
+SCHEDULE_TRIGGERS = {'cron': CronTrigger, 'interval': IntervalTrigger}
+
+def schedule_job(func, job_id, trigger, **trigger_args):
+    """
+    Registers a recurring job on the leader. A job already in the store keeps its
+    persisted next run time, so a run missed during downtime still happens on boot,
+    unless its schedule changed in code: then the stored trigger is replaced.
+    """
+    wanted = SCHEDULE_TRIGGERS[trigger](**trigger_args)
+    job = scheduler.get_job(job_id)
+    if job is None:
+        scheduler.add_job(func, trigger=wanted, id=job_id)
+    elif str(job.trigger) != str(wanted):
+        print(f"Rescheduling {job_id}: {job.trigger} -> {wanted}")
+        scheduler.reschedule_job(job_id, trigger=wanted)
+
+# Stored jobs reference module-level functions (not lambdas) so they can be reloaded
+def reconcile_stats_job():
+    reconcile_stats(rtdb)
+
+def rebuild_leaderboard_job():
+    board = rebuild_leaderboard(rtdb)
+    print(f"Leaderboard rebuilt with {len(board)} ranked learners")
+
+def batch_forecasts_job():
+    run_batch_forecasts(app, rtdb, MarketData)
+
+def climate_alerts_job():
+    with app.app_context():
+        # Fresh OpenWeather readings also go into the local weather history
+        regions = run_region_alerts(rtdb, api_key=os.environ.get('WEATHER_API_KEY'),
+                                    on_fetch=weather_store.record_observation)
+        print(f"Climate alerts refreshed for {regions} regions")
+
+def weather_compaction_job():
+    with app.app_context():
+        deleted = weather_store.compact()
+        print(f"Weather history compacted: {deleted} raw readings folded away")
+
+def drip_batch_job():
+    with app.app_context():
+        # One render for the whole batch; each recipient's name is swapped in afterwards
+        html = render_template('emails/drip_upgrade.html', name=DRIP_NAME_PLACEHOLDER)
+        summary = run_drip_batch(rtdb, html, send_drip_followup, wait=mailer.flush)
+        print(f"Drip batch: {summary['last_sent']} follow-ups sent in {summary['seconds']}s ({summary['emails_per_second']}/s)")
 
 # Database Config
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///farmerman.db'
@@ -67,10 +137,15 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 sqlalchemy_db.init_app(app)
 
 # Initialize SocketIO for real-time chat
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='gevent')
+# Set SOCKETIO_MESSAGE_QUEUE (e.g. redis://localhost:6379/0) when running more than one
+# worker or node, so emits and broadcasts reach sockets held by the other processes.
+SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='gevent', message_queue=SOCKETIO_MESSAGE_QUEUE)
 
-# Dictionary to track who is currently online { 'user_id': 'socket_id' }
-online_users = {}
+# Who is online, shared across workers through the same queue server (in-process without one)
+presence = PresenceRegistry(backend_for(SOCKETIO_MESSAGE_QUEUE))
+socketio.start_background_task(presence.run_heartbeats, socketio.sleep)
+atexit.register(presence.shutdown)
 
 # Folder for legacy chat media (Fallback if cloud fails)
 CHAT_MEDIA_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'chat_media')
@@ -91,6 +166,7 @@ def allowed_training_file(filename):
 # FIREBASE SECURE CONNECTION
 # ==========================================
 rtdb = None
+startup_health = StartupHealth()
 try:
     render_path = '/etc/secrets/serviceAccountKey.json'
     local_path = 'serviceAccountKey.json'
@@ -103,21 +179,65 @@ try:
             'storageBucket': 'farmerman-systems.firebasestorage.app'
         })
     
-    rtdb = firebase_db 
+    # Hot nodes (users, academy_courses, market_data...) are served from a TTL cache
+    rtdb = RTDBCache(firebase_db)
     print(f"Firebase securely initialized using: {cert_path}")
 
-    # CONNECTION TEST
-    test_fetch = rtdb.reference('users').get()
-    if test_fetch:
-        print(f"Connection Verified: Found {len(test_fetch)} records in 'users' node.")
-    else:
-        print("Warning: Connection successful but 'users' node appears empty.")
-
 except Exception as e:
     print(f"Firebase Initialization Error: {e}")
 
+# CONNECTION TEST: a single-key read in the background, reported on /diagnostics
+startup_health.check_in_background(rtdb)
+
 with app.app_context():
     sqlalchemy_db.create_all()
+    # Column / index changes to an existing farmerman.db (create_all never alters tables)
+    run_migrations(sqlalchemy_db.engine)
+
+# Fitted price models, reused until the MarketData series they were trained on changes
+forecast_service = ForecastService()
+
+def start_scheduler():
+    """
+    Starts the background jobs if this process wins the scheduler lock. Only the web
+    entrypoints call it, never an import: scripts that import main (seed_db.py,
+    stats.py, migrations.py, ...) would otherwise become leader and fire missed jobs.
+    :return: True if this process runs the jobs
+    """
+    global scheduler_lock
+    if scheduler_lock is not None:
+        return True
+    scheduler_lock = acquire_leader_lock(os.path.join(app.instance_path, 'scheduler.lock'))
+    if scheduler_lock is None:
+        return False
+    scheduler.start()
+
+    # Nightly rebuild of the admin dashboard aggregates in case the running totals drift
+    schedule_job(reconcile_stats_job, 'reconcile_stats', trigger='cron', hour=2)
+
+    # Overnight batch: forecast every (commodity, region) series off the request path
+    schedule_job(batch_forecasts_job, 'batch_forecasts', trigger='cron', hour=1)
+
+    # Daily pass over free-tier signups that are due the 3-day follow-up
+    schedule_job(drip_batch_job, 'drip_batch', trigger='cron', hour=9)
+
+    # Hourly climate alerts, computed once per region rather than once per user
+    schedule_job(climate_alerts_job, 'climate_alerts', trigger='interval', hours=1)
+
+    # Raw weather readings older than a week live on only in the hourly/daily rollups
+    schedule_job(weather_compaction_job, 'weather_compaction', trigger='cron', hour=3)
+
+    # The counters only start moving after the first rebuild, so run it now (in the background) if it never happened
+    if rtdb and not is_reconciled(rtdb):
+        scheduler.add_job(reconcile_stats_job, id='reconcile_stats_first', replace_existing=True)
+
+    # Same for the academy leaderboard: backfilled once from user_progress, then kept by awards
+    if rtdb and leaderboard_is_empty(rtdb):
+        scheduler.add_job(rebuild_leaderboard_job, id='rebuild_leaderboard_first', replace_existing=True)
+    return True
+
+# Academy points under 'leaderboard' in RTDB, read with indexed queries on points
+academy_board = Leaderboard(rtdb)
 
 
 # ==========================================
@@ -153,46 +273,21 @@ def upload_to_firebase_storage(file_obj, folder_name):
 # ASYNC EMAIL FUNCTIONS
 # ==========================================
 def send_async_emails(user_email, admin_email, user_msg_html, admin_msg_html, name, message_body, inquiry_subject):
-    """Background worker for Contact Forms using smtplib."""
-    try:
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server: 
-            server.login(app.config['MAIL_USERNAME'], app.config['MAIL_PASSWORD'])
-            
-            user_msg = EmailMessage()
-            user_msg['Subject'] = "We received your message - Farmerman Systems"
-            user_msg['From'] = f"Farmerman Support <{app.config['MAIL_USERNAME']}>"
-            user_msg['To'] = user_email
-            user_msg.set_content("Thank you for contacting Farmerman Systems. We will get back to you shortly.")
-            user_msg.add_alternative(user_msg_html, subtype='html')
-            server.send_message(user_msg)
-            
-            admin_msg = EmailMessage()
-            admin_msg['Subject'] = f"🚨 {inquiry_subject} Inquiry from {name}"
-            admin_msg['From'] = f"Farmerman Server <{app.config['MAIL_USERNAME']}>"
-            admin_msg['To'] = admin_email 
-            admin_msg.set_content(f"New {inquiry_subject} message from {name}: {message_body}")
-            admin_msg.add_alternative(admin_msg_html, subtype='html')
-            server.send_message(admin_msg)
-            
-    except Exception as e:
-        print(f"Failed to send background emails: {e}")
-
-def send_drip_followup(user_email, name):
-    """Background worker for the 3-Day Drip Campaign using Flask-Mail."""
-    with app.app_context(): 
-        try:
-            user_data = rtdb.reference('users').order_by_child('email').equal_to(user_email).get()
-            if user_data:
-                uid = list(user_data.keys())[0]
-                current_tier = user_data[uid].get('subscription_tier', 'free')
-
-                if current_tier == 'free':
-                    msg = Message("Still guessing market prices? 📈", recipients=[user_email])
-                    msg.html = render_template('emails/drip_upgrade.html', name=name)
-                    mail.send(msg)
-                    print(f"Drip email successfully sent to {user_email}")
-        except Exception as e:
-            print(f"Failed to send Drip Campaign email: {e}")
+    """Queues the Contact Form confirmation and admin notification for the email workers."""
+    mailer.submit(build_message(
+        "We received your message - Farmerman Systems", user_email, user_msg_html,
+        sender=f"Farmerman Support <{app.config['MAIL_USERNAME']}>",
+        text="Thank you for contacting Farmerman Systems. We will get back to you shortly."
+    ))
+    mailer.submit(build_message(
+        f"🚨 {inquiry_subject} Inquiry from {name}", admin_email, admin_msg_html,
+        sender=f"Farmerman Server <{app.config['MAIL_USERNAME']}>",
+        text=f"New {inquiry_subject} message from {name}: {message_body}"
+    ))
+
+def send_drip_followup(user_email, html):
+    """Queues one already-rendered 3-Day Drip Campaign email (see drip_batch_job). False if the queue is full."""
+    return mailer.submit(build_message("Still guessing market prices? 📈", user_email, html, sender=MAIL_SENDER))
 
 # ==========================================
 # CONTEXT PROCESSORS
@@ -303,26 +398,21 @@ def token_admin_required(f):
 # BACKGROUND EMAIL WORKER
 # ==========================================
 def send_welcome_email(user_email, name, role):
-    """Sends the welcome email in the background so the user doesn't wait."""
-    with app.app_context():
-        try:
-            # Personalize subject based on the new roles
-            if role == 'tutor':
-                subject = "Welcome to the Faculty!"
-            elif role == 'seller':
-                subject = "Ready to scale your agribusiness? 🚀"
-            else: # buyer or legacy client
-                subject = "Your Market Intelligence is Ready!"
-                
-            msg = Message(subject, recipients=[user_email])
-            
-            template = 'emails/welcome_tutor.html' if role == 'tutor' else 'emails/welcome_client.html'
-            msg.html = render_template(template, name=name)
+    """Renders the welcome email and queues it, so the user doesn't wait on SMTP."""
+    try:
+        # Personalize subject based on the new roles
+        if role == 'tutor':
+            subject = "Welcome to the Faculty!"
+        elif role == 'seller':
+            subject = "Ready to scale your agribusiness? 🚀"
+        else: # buyer or legacy client
+            subject = "Your Market Intelligence is Ready!"
             
-            mail.send(msg)
-            print(f"Welcome email successfully sent to {user_email}")
-        except Exception as e:
-            print(f"Failed to send welcome email: {e}")
+        template = 'emails/welcome_tutor.html' if role == 'tutor' else 'emails/welcome_client.html'
+        mailer.submit(build_message(subject, user_email, render_template(template, name=name), sender=MAIL_SENDER))
+        print(f"Welcome email queued for {user_email}")
+    except Exception as e:
+        print(f"Failed to queue welcome email: {e}")
 
 
 
@@ -346,8 +436,8 @@ def register():
             # 2. Create Auth User
             user = auth.create_user(email=email, password=password, display_name=full_name)
             
-            # 3. Initialize profile in RTDB
-            rtdb.reference(f'users/{user.uid}').set({
+            # 3. Initialize profile in RTDB (and its role/tier/email index entries)
+            profile = {
                 'uid': user.uid,
                 'full_name': full_name, 
                 'email': email, 
@@ -355,19 +445,14 @@ def register():
                 'role': selected_role, 
                 'subscription_tier': 'free', 
                 'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            })
+            }
+            rtdb.reference(f'users/{user.uid}').set(profile)
+            sync_user_index(rtdb, user.uid, profile)
             
             # 4. Fire off the Welcome Email
-            threading.Thread(target=send_welcome_email, args=(email, full_name, selected_role)).start()
+            send_welcome_email(email, full_name, selected_role)
             
-            # 5. Schedule the Drip Campaign
-            run_time = datetime.now() + timedelta(days=3)
-            scheduler.add_job(
-                func=send_drip_followup,
-                trigger='date',
-                run_date=run_time,
-                args=[email, full_name]
-            )
+            # 5. Drip Campaign: picked up by the daily drip_batch job 3 days from now
 
             # 6. Redirect to Login
             flash("Account created successfully! Check your inbox for the welcome email.", "success")
@@ -404,7 +489,9 @@ def login():
             else:
                 raw_role = 'buyer'
                 raw_tier = 'free'
-                user_ref.set({'email': email, 'role': raw_role, 'subscription_tier': raw_tier, 'uid': uid})
+                healed_profile = {'email': email, 'role': raw_role, 'subscription_tier': raw_tier, 'uid': uid}
+                user_ref.set(healed_profile)
+                sync_user_index(rtdb, uid, healed_profile)
 
             # 3. Secure the Session
             session.clear() 
@@ -524,7 +611,7 @@ def account_settings():
     user_ref = rtdb.reference(f'users/{uid}')
     
     if request.method == 'POST':
-        user_ref.update({
+        update_user_profile(rtdb, uid, {
             'full_name': request.form.get('full_name'),
             'phone': request.form.get('phone'),
             'location': request.form.get('location')
@@ -541,58 +628,51 @@ def account_settings():
 @app.route('/admin/dashboard')
 @admin_required
 def admin_dashboard(): 
-    users = rtdb.reference('users').get() or {}
-    market = rtdb.reference('market_data').get() or {}
-    txns = rtdb.reference('completed_transactions').get() or {}
-    
-    # 1. Existing Revenue & Subscriptions Logic
-    rev = 0.0; recent = []
-    for uid, u_txns in txns.items():
-        u_info = users.get(uid, {})
-        for t in u_txns.values():
-            rev += float(t.get('amount', 0))
-            recent.append({'name': u_info.get('full_name', 'User'), 'date': t.get('date', ''), 'plan': t.get('plan', 'Pro'), 'email': u_info.get('email', 'N/A')})
-            
-    recent.sort(key=lambda x: x['date'], reverse=True)
+    # Shallow reads only return the keys, which is all we need for the headcounts
+    user_keys = rtdb.reference('users').get(shallow=True) or {}
+    market_keys = rtdb.reference('market_data').get(shallow=True) or {}
     
+    # 1. Revenue, Deposits & Pending Loans come from the running aggregates in 'stats'
+    dashboard_stats = load_dashboard_stats(rtdb)
+    rev = dashboard_stats['revenue']
+    recent = dashboard_stats['recent_transactions']
+
     # 2. NEW: Global Banking System Analytics
-    banking_groups = rtdb.reference('banking_groups').get() or {}
-    total_groups = len(banking_groups)
-    
-    banking_accounts = rtdb.reference('banking_accounts').get() or {}
-    total_deposits = 0.0
-    for acc in banking_accounts.values():
-        total_deposits += float(acc.get('emergency_fund', 0.0))
-        for grp_balance in acc.get('standard_savings', {}).values():
-            total_deposits += float(grp_balance)
+    total_groups = len(rtdb.reference('banking_groups').get(shallow=True) or {})
+    total_deposits = dashboard_stats['deposits']
             
     # 3. NEW: Pending Loan Requests
-    all_loans = rtdb.reference('banking_loans').get() or {}
+    pending = dashboard_stats['pending_loans']
+
+    # Only fetch the profiles we actually display
+    users = get_users(rtdb, {t.get('uid') for t in recent} | {loan.get('uid') for loan in pending.values()})
+    for t in recent:
+        u_info = users.get(t.pop('uid', None), {})
+        t['name'] = u_info.get('full_name', 'User')
+        t['email'] = u_info.get('email', 'N/A')
+
     pending_loans = []
-    for uid, user_loans in all_loans.items():
-        if isinstance(user_loans, dict):
-            for loan_id, loan_data in user_loans.items():
-                if loan_data.get('status') == 'Pending Review':
-                    loan_data['loan_id'] = loan_id
-                    loan_data['uid'] = uid
-                    
-                    # Attach user contact info so admin can call them
-                    user_profile = users.get(uid, {})
-                    loan_data['user_name'] = user_profile.get('full_name', 'Unknown')
-                    loan_data['user_email'] = user_profile.get('email', 'No Email')
-                    # Prefer the phone number typed in the loan request, fallback to profile phone if missing
-                    loan_data['user_phone'] = loan_data.get('phone_number', user_profile.get('phone', 'No Phone Provided'))
-                    
-                    pending_loans.append(loan_data)
+    for loan_id, loan_data in pending.items():
+        uid = loan_data.get('uid')
+        loan_data['loan_id'] = loan_id
+        
+        # Attach user contact info so admin can call them
+        user_profile = users.get(uid, {})
+        loan_data['user_name'] = user_profile.get('full_name', 'Unknown')
+        loan_data['user_email'] = user_profile.get('email', 'No Email')
+        # Prefer the phone number typed in the loan request, fallback to profile phone if missing
+        loan_data['user_phone'] = loan_data.get('phone_number', user_profile.get('phone', 'No Phone Provided'))
+        
+        pending_loans.append(loan_data)
                     
     pending_loans.sort(key=lambda x: x.get('requested_at', ''), reverse=True)
 
     return render_template(
         'admin dashboard.html', 
-        total_subscribers=len(users), 
-        active_feeds=len(market), 
+        total_subscribers=len(user_keys), 
+        active_feeds=len(market_keys), 
         total_revenue=rev, 
-        recent_transactions=recent[:5],
+        recent_transactions=recent,
         total_groups=total_groups,
         total_deposits=total_deposits,
         pending_loans=pending_loans
@@ -610,6 +690,7 @@ def admin_process_loan():
             'status': action,
             'processed_at': datetime.now(timezone(timedelta(hours=3))).strftime("%Y-%m-%d %H:%M:%S")
         })
+        resolve_pending_loan(rtdb, loan_id)
         flash(f"Loan successfully {action}.", "success")
     except Exception as e:
         flash(f"Error processing loan: {e}", "danger")
@@ -721,8 +802,16 @@ def content_manager():
 @app.route('/admin/subscribers')
 @admin_required
 def subscriber_management():
+    # Optional ?role= / ?tier= filters are answered from the secondary indexes
+    role_filter = request.args.get('role')
+    tier_filter = request.args.get('tier')
     try:
-        all_users = rtdb.reference('users').get()
+        if role_filter:
+            all_users = users_by(rtdb, 'by_role', role_filter)
+        elif tier_filter:
+            all_users = users_by(rtdb, 'by_tier', tier_filter)
+        else:
+            all_users = rtdb.reference('users').get()
         subscribers_list = [{'uid': uid, **data} for uid, data in all_users.items()] if all_users else []
         return render_template('subscriber management.html', subscribers=subscribers_list)
     except Exception as e:
@@ -742,7 +831,7 @@ def update_user_role():
         return redirect(url_for('subscriber_management'))
 
     try:
-        rtdb.reference(f'users/{target_uid}').update({
+        update_user_profile(rtdb, target_uid, {
             'role': new_role,
             'subscription_tier': new_tier
         })
@@ -777,11 +866,13 @@ def live_market_prices():
 @login_required
 @premium_required 
 def trends_forecasts():
-    records = MarketData.query.filter_by(commodity="Maize (90kg)").all()
-    hist = [{'date': r.updated_at, 'price': r.price} for r in records]
-    labels = [r.updated_at.strftime('%b %d') for r in records]
+    records = MarketData.query.filter_by(commodity="Maize (90kg)").order_by(MarketData.observed_on, MarketData.id).all()
+    labels = [r.observed_on.strftime('%b %d') for r in records]
     prices = [r.price for r in records]
-    ai = generate_price_forecast(hist, 5) if len(hist) >= 5 else {}
+    # Prefer the overnight batch result; only train inline if the job hasn't covered this series yet
+    ai = get_forecast(rtdb, "Maize (90kg)") or {}
+    if not ai and len(records) >= 5:
+        ai = forecast_service.forecast("Maize (90kg)", None, records, 5)
     if ai and "error" not in ai:
         labels.extend(ai['future_dates']); prices.extend(ai['predicted_prices'])
     return render_template('trends&forecasts.html', labels=labels, prices=prices, ai_insight=ai)
@@ -792,7 +883,48 @@ def api_market_prices():
         return jsonify({"error": "Premium subscription required to access raw data"}), 403
         
     items = rtdb.reference('market_data').get() or {}
-    return jsonify([{'id': k, **v} for k, v in items.items()]), 200
+    prices = [{'id': k, **v} for k, v in items.items()]
+    
+    # Opt-in so existing clients keep receiving the flat list
+    if request.args.get('include_forecasts') == '1':
+        forecasts = rtdb.reference(FORECASTS_ROOT).get() or {}
+        return jsonify({'prices': prices, 'forecasts': list(forecasts.values())}), 200
+    return jsonify(prices), 200
+
+@app.route('/api/market-prices/series', methods=['GET'])
+def api_market_price_series():
+    """
+    Pre-aggregated price series for one commodity:
+    ?commodity=&region=&start=YYYY-MM-DD&end=YYYY-MM-DD&resolution=day|week|month
+    Sends an ETag; a client repeating the request with If-None-Match gets a bodiless 304
+    until a matching price is added or edited.
+    """
+    if session.get('tier') not in ['premium', 'pro'] and session.get('user_role') not in ['admin', 'tutor']:
+        return jsonify({"error": "Premium subscription required to access raw data"}), 403
+
+    commodity = (request.args.get('commodity') or '').strip()
+    if not commodity:
+        return jsonify({"error": "commodity is required"}), 400
+    region = (request.args.get('region') or '').strip() or None
+    resolution = request.args.get('resolution', market_series.DEFAULT_RESOLUTION)
+    if resolution not in market_series.RESOLUTIONS:
+        return jsonify({"error": f"resolution must be one of {', '.join(market_series.RESOLUTIONS)}"}), 400
+    try:
+        start = datetime.strptime(request.args['start'], "%Y-%m-%d").date() if request.args.get('start') else None
+        end = datetime.strptime(request.args['end'], "%Y-%m-%d").date() if request.args.get('end') else None
+    except ValueError:
+        return jsonify({"error": "start and end must be YYYY-MM-DD"}), 400
+
+    # Revalidation costs one aggregate query; the series itself is only built on a miss
+    etag = market_series.series_version(MarketData, commodity, region, start, end, resolution)
+    if etag in request.if_none_match:
+        resp = app.response_class(status=304)
+    else:
+        points = market_series.price_series(MarketData, commodity, region, start, end, resolution)
+        resp = jsonify({'commodity': commodity, 'region': region or 'All Regions', 'resolution': resolution, 'points': points})
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
 
 # ==========================================
 # FARMERMAN ACADEMY (STUDENT ROUTES)
@@ -917,26 +1049,8 @@ def generate_certificate():
 @app.route('/academy/leaderboard')
 @login_required
 def academy_leaderboard():
-    all_users = rtdb.reference('users').get() or {}
-    all_progress = rtdb.reference('user_progress').get() or {}
-    leaderboard = []
-    
-    for uid, user_data in all_users.items():
-        # Allow legacy clients, new buyers, and new sellers to appear on the board
-        user_role = user_data.get('role', 'buyer').lower()
-        if user_role not in ['client', 'buyer', 'seller']:
-            continue
-            
-        name = user_data.get('full_name', 'Anonymous Farmer')
-        points = sum(100 for course_data in all_progress.get(uid, {}).values() if int(course_data.get('progress', 0)) >= 100)
-                    
-        if points > 0:
-            leaderboard.append({'uid': uid, 'name': name, 'points': points})
-            
-    leaderboard.sort(key=lambda x: x['points'], reverse=True)
-    
-    current_user_id = session.get('user_id')
-    current_user_rank = next(({'rank': i + 1, 'points': u['points']} for i, u in enumerate(leaderboard) if u['uid'] == current_user_id), None)
+    leaderboard = academy_board.top(10)
+    current_user_rank = academy_board.rank_of(session.get('user_id'))
 
     return render_template('academy/academy_leaderboard.html', 
                            leaderboard=leaderboard, 
@@ -999,10 +1113,29 @@ def update_progress():
         return jsonify({"error": "Missing course ID"}), 400
         
     try:
-        rtdb.reference(f'user_progress/{user_id}/{course_id}').update({
-            'progress': progress,
-            'last_accessed': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        })
+        progress_ref = rtdb.reference(f'user_progress/{user_id}/{course_id}')
+        outcome = {}
+
+        def apply(current):
+            # Award leaderboard points only on the update that first reaches 100%;
+            # points_awarded keeps a course that drops back and re-crosses from paying twice
+            current = dict(current) if isinstance(current, dict) else {}
+            already = bool(current.get('points_awarded')) or int(current.get('progress', 0) or 0) >= 100
+            outcome['award'] = not already and int(progress) >= 100
+            current.update({
+                'progress': progress,
+                'last_accessed': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            })
+            if already or outcome['award']:
+                current['points_awarded'] = True
+            return current
+
+        progress_ref.transaction(apply)
+        if outcome.get('award'):
+            profile = rtdb.reference(f'users/{user_id}').get() or {}
+            if str(profile.get('role', 'buyer')).lower() in ELIGIBLE_ROLES:
+                academy_board.award_course_completion(user_id, profile.get('full_name', 'Anonymous Farmer'))
+                
         return jsonify({"success": True, "message": "Progress updated"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -1086,9 +1219,10 @@ def tutor_dashboard():
 @app.route('/academy/tutor/gradebook')
 @tutor_required
 def tutor_gradebook():
-    all_users = rtdb.reference('users').get() or {}
     all_courses = rtdb.reference('academy_courses').get() or {}
     all_progress = rtdb.reference('user_progress').get() or {}
+    # Names and emails come from the by_role index cards: one read per role bucket
+    all_users = users_by_roles(rtdb, USER_ROLES)
     
     student_records = []
     total_completions = 0
@@ -1256,7 +1390,7 @@ def record_successful_transaction(user_id, plan_id, amount, gateway, receipt_num
     """Updates the user tier and logs the transaction securely."""
     try:
         # 1. Upgrade the user's tier
-        rtdb.reference(f'users/{user_id}').update({'subscription_tier': plan_id})
+        update_user_profile(rtdb, user_id, {'subscription_tier': plan_id})
         
         # 2. Update their active session if they are currently logged in
         if session.get('user_id') == user_id:
@@ -1264,13 +1398,17 @@ def record_successful_transaction(user_id, plan_id, amount, gateway, receipt_num
             session['subscription_tier'] = plan_id
             
         # 3. Log the financial transaction
+        txn_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         rtdb.reference(f'completed_transactions/{user_id}').push({
             'receipt_number': receipt_number, 
             'amount': amount,
             'gateway': gateway,
             'plan_purchased': plan_id,
-            'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            'date': txn_date
         })
+        
+        # 4. Bump the admin dashboard revenue aggregate
+        record_revenue(rtdb, user_id, amount, plan_id, txn_date)
         return True
     except Exception as e:
         print(f"CRITICAL: Failed to record successful transaction for {user_id}. Error: {e}")
@@ -1353,6 +1491,8 @@ def mpesa_callback():
                         current_bal = float(account_ref.get() or 0.0)
                         account_ref.set(current_bal + amount)
                     
+                    record_deposit(rtdb, amount)
+                    
                     # Log the banking transaction
                     rtdb.reference(f'banking_transactions/{uid}').push({
                         'type': 'deposit',
@@ -1607,7 +1747,7 @@ def contact_us():
         admin_html = render_template('email_admin_notification.html', name=name, email=email, subject=subject, message=message, timestamp=timestamp)
         
         # BUG FIX: Use app.config['MAIL_USERNAME'] instead of undefined MAIL_USERNAME
-        threading.Thread(target=send_async_emails, args=(email, app.config['MAIL_USERNAME'], user_html, admin_html, name, message, subject)).start()
+        send_async_emails(email, app.config['MAIL_USERNAME'], user_html, admin_html, name, message, subject)
         
         flash("Message sent! Check your email for a confirmation receipt.", "success")
         return redirect(url_for('contact_us'))
@@ -1619,8 +1759,10 @@ def contact_us():
 def delete_account():
     user_id = session.get('user_id')
     try:
-        # 1. Remove from Firebase
+        # 1. Remove from Firebase (and drop the user's index entries)
+        previous = fresh_profile(rtdb, user_id)
         rtdb.reference(f'users/{user_id}').delete()
+        sync_user_index(rtdb, user_id, None, previous)
         
         # 2. Clear local session
         session.clear()
@@ -1638,40 +1780,63 @@ def delete_account():
     
 @app.route('/diagnostics', methods=['GET'])
 def diagnostics():
+    firebase_health = startup_health.snapshot()
     health_data = {
-        "status": "Healthy",
+        "status": "Degraded" if firebase_health['status'] == 'error' else "Healthy",
+        "firebase": firebase_health,
         "system": "Farmerman Systems",
         "timestamp": datetime.now().strftime("%Y-%b-%d %H:%M:%S"),
         "version": "2.1.0",
-        "uptime": "99.9%" 
+        "uptime": "99.9%",
+        "rtdb_cache": rtdb.stats() if rtdb else None,
+        "email_queue": mailer.stats()
     }
     return render_template('diagnostics.html', data=health_data)
 # ==========================================
 # REAL-TIME CHAT SYSTEM (Strict Privacy & Online-Only)
 # ==========================================
+# Roles listed in the chat sidebar (read from the by_role index, not the full 'users' tree)
+CHAT_ROLES = list(USER_ROLES)
+CHAT_DIRECTORY_PAGE = 30
+CHAT_CONTACTS_PAGE = 30
+
 @app.route('/chat/dashboard')
 @login_required
 @premium_required
 # @premium_required # Uncomment if you want this protected
 def chat_dashboard():
-    """Chat dashboard showing all users and their current online status."""
+    """Chat dashboard: the user directory, one page at a time, with current online status."""
     current_uid = session.get('user_id')
-    all_users = rtdb.reference('users').get() or {}
-    
-    online_contacts = []
-    for uid, data in all_users.items():
-        # WE NO LONGER FILTER OUT OFFLINE USERS HERE!
-        if uid != current_uid:
-            online_contacts.append({
-                'uid': uid,
-                'name': data.get('full_name', 'Farmer'),
-                'role': data.get('role', 'buyer'),
-                # We pass the status to the frontend instead of filtering
-                'is_online': uid in online_users 
-            })
-            
+    directory, next_cursor = directory_contacts(current_uid)
     # Pointing exactly to the file inside the chat folder
-    return render_template('chat/dashboard.html', online_contacts=online_contacts)
+    return render_template('chat/dashboard.html', online_contacts=directory, next_cursor=next_cursor)
+
+def directory_contacts(current_uid, after=None, limit=CHAT_DIRECTORY_PAGE, exclude=(), my_location=''):
+    """
+    One page of the chat directory (every chat role) as sidebar cards, plus the next cursor.
+    Locations stay on the server: cards only say whether they match mine.
+    """
+    rows, next_cursor = users_page(rtdb, 'by_role', CHAT_ROLES, after=after, limit=limit)
+    online_now = presence.online_among([uid for _, uid, _ in rows])
+    contacts = []
+    for _, uid, card in rows:
+        if uid == current_uid or uid in exclude:
+            continue
+        contacts.append({
+            'uid': uid,
+            'name': card.get('full_name', 'Farmer'),
+            'role': card.get('role', 'client'),
+            'same_location': same_location(my_location, card.get('location')),
+            # We pass the status to the frontend instead of filtering
+            'is_online': uid in online_now
+        })
+    return contacts, next_cursor
+
+def same_location(my_location, their_location):
+    return 1 if my_location and (their_location or '').strip().lower() == my_location else 0
+
+def my_chat_location(uid):
+    return (rtdb.reference(f'users/{uid}').get() or {}).get('location', '').strip().lower()
 
 @app.route('/chat')
 @login_required
@@ -1682,36 +1847,32 @@ def chat_home():
     auto_open_uid = request.args.get('target_uid')
     auto_open_name = request.args.get('target_name')
     
-    all_users = rtdb.reference('users').get() or {}
-    all_chats = rtdb.reference('chats').get() or {}
-    
-    # FETCH UNREAD COUNTS FOR THE CURRENT USER
-    my_unread_counts = rtdb.reference(f'unread_counts/{current_uid}').get() or {}
-    
-    current_user_profile = all_users.get(current_uid, {})
-    my_location = current_user_profile.get('location', '').strip().lower()
-    
+    # My rooms and unread counts, from my own chat_index branch (never the message tree).
+    # Only the first page of conversations is rendered; the rest come from /api/chat/contacts.
+    my_chats = load_chat_index(rtdb, current_uid)
+    my_chats.pop(current_uid, None)
+    window = sorted_contacts(my_chats)[:CHAT_CONTACTS_PAGE]
+    profiles = get_users(rtdb, [uid for uid, _ in window])
+    online_now = presence.online_among([uid for uid, _ in window])
+    my_location = my_chat_location(current_uid)
+
     contacts = []
-    for uid, data in all_users.items():
-        if uid != current_uid:
-            room_id = f"room_{min(str(current_uid), str(uid))}_{max(str(current_uid), str(uid))}"
-            has_talked_before = 1 if room_id in all_chats else 0
-            their_location = data.get('location', '').strip().lower()
-            is_same_location = 1 if (my_location and their_location == my_location) else 0
-            
-            # Extract the specific unread count for this contact
-            unread_count = my_unread_counts.get(uid, 0)
-
-            contacts.append({
-                'uid': uid,
-                'name': data.get('full_name', 'Farmer'),
-                'role': data.get('role', 'client'),
-                'is_online': uid in online_users,
-                'has_talked': has_talked_before,
-                'same_location': is_same_location,
-                'unread': unread_count # <-- NEW DATA POINT
-            })
-            
+    for uid, entry in window:
+        data = profiles.get(uid, {})
+        contacts.append({
+            'uid': uid,
+            'name': data.get('full_name', 'Farmer'),
+            'role': data.get('role', 'client'),
+            'same_location': same_location(my_location, data.get('location')),
+            'is_online': uid in online_now,
+            'has_talked': 1,
+            'unread': entry.get('unread', 0)
+        })
+    # People I haven't talked to yet: the first directory page, the rest via /api/chat/contacts
+    directory, next_cursor = directory_contacts(current_uid, exclude=my_chats, my_location=my_location)
+    for contact in directory:
+        contacts.append({**contact, 'has_talked': 0, 'unread': 0})
+
     # Sort logic: Unread messages float to the very top, then Talked, then Location, then Online
     contacts.sort(key=lambda x: (x['unread'] > 0, x['has_talked'], x['same_location'], x['is_online']), reverse=True)
             
@@ -1720,8 +1881,54 @@ def chat_home():
         contacts=contacts, 
         current_uid=current_uid,
         auto_open_uid=auto_open_uid,   
-        auto_open_name=auto_open_name  
+        auto_open_name=auto_open_name,
+        more_conversations=len(my_chats) > CHAT_CONTACTS_PAGE,
+        conversations_per_page=CHAT_CONTACTS_PAGE,
+        next_cursor=next_cursor
     )
+
+@app.route('/api/chat/contacts')
+@login_required
+def api_chat_contacts():
+    """
+    Paginated contacts for the chat sidebar: unread first, then most recent conversation.
+    ?scope=directory pages through everyone else instead (?after= is the previous page's next_cursor).
+    """
+    current_uid = session.get('user_id')
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+
+    if request.args.get('scope') == 'directory':
+        directory, next_cursor = directory_contacts(current_uid, after=request.args.get('after'), limit=per_page,
+                                                    my_location=my_chat_location(current_uid))
+        return jsonify({'contacts': directory, 'next_cursor': next_cursor, 'has_more': next_cursor is not None})
+
+    page = max(request.args.get('page', 1, type=int), 1)
+    ordered = sorted_contacts(load_chat_index(rtdb, current_uid))
+    window = ordered[(page - 1) * per_page: page * per_page]
+
+    # Profiles for this page only
+    profiles = get_users(rtdb, [uid for uid, _ in window])
+    online_now = presence.online_among([uid for uid, _ in window])
+
+    contacts = []
+    for uid, entry in window:
+        profile = profiles.get(uid, {})
+        contacts.append({
+            'uid': uid,
+            'name': profile.get('full_name', 'Farmer'),
+            'role': profile.get('role', 'client'),
+            'is_online': uid in online_now,
+            'last_at': entry.get('last_at'),
+            'unread': entry.get('unread', 0)
+        })
+
+    return jsonify({
+        'contacts': contacts,
+        'page': page,
+        'per_page': per_page,
+        'total': len(ordered),
+        'has_more': page * per_page < len(ordered)
+    })
     
 @app.route('/api/chat/upload', methods=['POST'])
 @login_required
@@ -1744,31 +1951,78 @@ def upload_chat_media():
 
 # --- SOCKET.IO EVENTS ---
 
+def chat_contacts(uids):
+    """
+    Maps each uid to the users they share a chat room with.
+    A shallow read of each user's chat_index branch: O(their contacts).
+    """
+    return {uid: contact_uids(rtdb, uid) for uid in set(uids)}
+
+def send_presence_delta(recipient, delta):
+    # Personal room joined on connect; reaches every tab, on any worker
+    socketio.emit('presence_delta', delta, to=recipient)
+
+presence_fanout = PresenceFanout(chat_contacts, send_presence_delta, is_online=presence.is_online)
+socketio.start_background_task(presence_fanout.run_flushes, socketio.sleep)
+
 @socketio.on('connect')
 def handle_connect():
     uid = session.get('user_id')
     if uid:
-        online_users[uid] = request.sid
+        came_online = presence.connect(request.sid, uid)
         
         # NEW: Join a personal room using the user's ID. 
         # This allows the server to send global notifications (like unread badges) 
         # directly to this user, regardless of what chat they are looking at.
         join_room(uid) 
         
-        # 1. Update the green dots for everyone
-        emit('user_status', {'uid': uid, 'status': 'online'}, broadcast=True)
-        # 2. Tell everyone to refresh their sidebar
-        emit('refresh_contacts', broadcast=True, include_self=False)
+        # A second tab (or a socket on another worker) doesn't change anyone's sidebar.
+        # Contacts get the green dot in the next batched delta; nobody reloads their page.
+        if came_online:
+            presence_fanout.mark(uid, 'online')
 
 @socketio.on('disconnect')
 def handle_disconnect():
-    uid = session.get('user_id')
-    if uid and uid in online_users:
-        del online_users[uid]
-        # 1. Turn the dot grey for everyone
-        emit('user_status', {'uid': uid, 'status': 'offline'}, broadcast=True)
-        # 2. Tell everyone to refresh sidebar
-        emit('refresh_contacts', broadcast=True)
+    # Only reported once the user's last socket, on any worker, has gone
+    uid = presence.disconnect(request.sid)
+    if uid:
+        presence_fanout.mark(uid, 'offline')
+
+# Messages per history page; older pages are pulled with 'load_older' as the user scrolls up
+CHAT_PAGE_SIZE = 50
+
+def load_chat_page(room, uid, before=None, page_size=CHAT_PAGE_SIZE):
+    """
+    Returns one page of a room's history, oldest first, plus the cursor for the next page up.
+    Push keys sort chronologically, so the newest page is simply the last N keys and
+    anything at or before the user's clear watermark is never fetched at all.
+    """
+    watermark = rtdb.reference(f'chat_clears/{room}/{uid}').get()
+
+    query = rtdb.reference(f'chats/{room}').order_by_key()
+    if watermark:
+        query = query.start_at(watermark)
+    if before:
+        # end_at is inclusive, so ask for one extra key and drop the cursor itself
+        raw = query.end_at(before).limit_to_last(page_size + 2).get() or {}
+        raw.pop(before, None)
+    else:
+        raw = query.limit_to_last(page_size + 1).get() or {}
+    # start_at is inclusive too: the watermark is the last message the user cleared
+    if watermark:
+        raw.pop(watermark, None)
+
+    keys = sorted(raw.keys())
+    has_more = len(keys) > page_size
+    keys = keys[-page_size:]
+
+    # Messages hidden with the old per-message 'deleted_for' tags are still honoured
+    messages = [raw[k] for k in keys if uid not in raw[k].get('deleted_for', [])]
+    return {
+        'messages': messages,
+        'cursor': keys[0] if keys else None,
+        'has_more': has_more
+    }
 
 @socketio.on('join_chat')
 def handle_join_chat(data):
@@ -1779,19 +2033,25 @@ def handle_join_chat(data):
     room = f"room_{min(str(uid1), str(uid2))}_{max(str(uid1), str(uid2))}"
     join_room(room)
     
-    history = rtdb.reference(f'chats/{room}').get() or {}
-    messages = []
-    
-    # SMART FETCH: Only send messages that the user hasn't deleted for themselves
-    for msg in history.values():
-        if uid1 not in msg.get('deleted_for', []):
-            messages.append(msg)
+    page = load_chat_page(room, uid1)
             
     # NEW: RESET UNREAD COUNTER
     # Since the user just opened this chat, set their unread count from this sender to 0
-    rtdb.reference(f'unread_counts/{uid1}/{uid2}').set(0)
+    reset_unread(rtdb, uid1, uid2)
             
-    emit('chat_history', messages)
+    emit('chat_history', page)
+
+@socketio.on('load_older')
+def handle_load_older(data):
+    uid1 = session.get('user_id')
+    uid2 = data.get('target_uid')
+    cursor = data.get('cursor')
+    if not uid2 or not cursor: return
+
+    room = f"room_{min(str(uid1), str(uid2))}_{max(str(uid1), str(uid2))}"
+    page = load_chat_page(room, uid1, before=cursor)
+    page['target_uid'] = uid2
+    emit('older_messages', page)
 
 @socketio.on('clear_chat')
 def handle_clear_chat(data):
@@ -1803,20 +2063,17 @@ def handle_clear_chat(data):
     room = f"room_{min(str(uid), str(target_uid))}_{max(str(uid), str(target_uid))}"
     
     if mode == 'all':
-        # Wipe it completely from the database
+        # Wipe it completely from the database (watermarks included)
         rtdb.reference(f'chats/{room}').delete()
+        rtdb.reference(f'chat_clears/{room}').delete()
         emit('chat_cleared', {'mode': 'all'}, room=room)
     else:
         # CLEAR FOR ME ONLY
-        messages_ref = rtdb.reference(f'chats/{room}')
-        messages = messages_ref.get() or {}
-        
-        # Loop through existing messages and tag them as hidden for this specific user
-        for msg_key, msg_data in messages.items():
-            deleted_for = msg_data.get('deleted_for', [])
-            if uid not in deleted_for:
-                deleted_for.append(uid)
-                messages_ref.child(msg_key).update({'deleted_for': deleted_for})
+        # Record the newest message key as this user's watermark: one read and one write,
+        # however long the room is. History loads skip everything at or before it.
+        latest = rtdb.reference(f'chats/{room}').order_by_key().limit_to_last(1).get() or {}
+        if latest:
+            rtdb.reference(f'chat_clears/{room}/{uid}').set(next(iter(latest)))
                 
         # Emit the clear screen event ONLY to the person who clicked the button
         emit('chat_cleared', {'mode': 'me'}, to=request.sid)
@@ -1843,20 +2100,19 @@ def handle_send_message(data):
     
     # 1. Save Message to Database
     rtdb.reference(f'chats/{room}').push(message_data)
-    
-    # 2. INCREMENT UNREAD COUNTER
-    unread_ref = rtdb.reference(f'unread_counts/{receiver_id}/{sender_id}')
-    current_unread = unread_ref.get() or 0
-    new_unread_count = current_unread + 1
-    unread_ref.set(new_unread_count)
+
+    # 2. Bump both sides' chat_index entries and the receiver's unread counter in the same write
+    # (a server-side increment, so concurrent senders never overwrite each other)
+    record_message(rtdb, sender_id, receiver_id, datetime.now(eat_timezone).strftime("%Y-%m-%d %H:%M:%S"))
     
     # 3. Broadcast the message to the active chat room
     emit('receive_message', message_data, room=room)
     
     # 4. Global UI Notification
+    # The update doesn't return the new count, so the badge adds one to what it shows
     emit('update_unread_badge', {
         'sender_id': sender_id, 
-        'count': new_unread_count
+        'increment': 1
     }, room=receiver_id)
     
 @socketio.on('typing')
@@ -1900,11 +2156,14 @@ def climate_hub():
     """Weather and Climate Smart Agriculture dashboard."""
     user_id = session.get('user_id')
     
-    # Fetch ONLY this user's personal alerts from Firebase
-    climate_data = rtdb.reference(f'climate_alerts/{user_id}').get()
+    # One read: the shared alerts for the region this user follows
+    profile = rtdb.reference(f'users/{user_id}').get() or {}
+    alerts = load_region_alerts(rtdb, user_region(profile))
+    
+    # This user's own alerts from their browser's last reading, until their region has been computed
+    climate_data = rtdb.reference(f'climate_alerts/{user_id}').get() if not alerts else None
     
     # Format the data depending on how Firebase returned it
-    alerts = []
     if isinstance(climate_data, dict):
         alerts = [{'id': k, **v} for k, v in climate_data.items()]
     elif isinstance(climate_data, list):
@@ -1918,7 +2177,7 @@ def climate_hub():
 
 # Make sure you have these imports at the top of your main.py!
 from flask import request, jsonify
-from logic import analyze_weather_and_generate_alerts, update_firebase_alerts
+from logic import analyze_weather_and_generate_alerts
 # In main.py
 @app.route('/api/climate/analyze', methods=['POST'])
 @token_required
@@ -1935,20 +2194,46 @@ def analyze_climate():
         humidity = float(data.get('humidity', 0))
         wind = float(data.get('wind', 0))
         condition = str(data.get('condition', ''))
-        region = str(data.get('region', 'Unknown Region'))
+        region = str(data.get('region') or '').strip()
         
-        # Generate the alerts
-        new_alerts = analyze_weather_and_generate_alerts(temp, humidity, wind, condition, region)
+        # Follow this region from now on; its shared alerts come only from the scheduled OpenWeather refresh
+        region_key = register_region(rtdb, region)
+        if not region_key:
+            return jsonify({"status": "error", "message": "Missing region"}), 400
+        
+        profile = (rtdb.reference(f'users/{user_id}').get() or {}) if user_id else {}
+        if user_id and profile.get('climate_region') != region_key:
+            rtdb.reference(f'users/{user_id}').update({'climate_region': region_key})
         
-        # Save them ONLY to this user's profile!
-        update_firebase_alerts(user_id, new_alerts)
+        # A browser-reported reading only ever produces this user's own alerts
+        new_alerts = analyze_weather_and_generate_alerts(temp, humidity, wind, condition, region)
+        if user_id:
+            rtdb.reference(f'climate_alerts/{user_id}').set(new_alerts)
         
-        return jsonify({"status": "success", "message": "Updated personal alerts!"}), 200
+        return jsonify({"status": "success", "message": "Updated personal alerts!", "region": region_key}), 200
         
     except Exception as e:
         print(f"Engine Error: {e}")
         return jsonify({"status": "error", "message": "Failed to analyze"}), 500
     
+@app.route('/api/climate/history')
+@login_required
+def climate_history():
+    """Weather history for a region: ?region=&start=YYYY-MM-DD&end=YYYY-MM-DD&resolution=raw|hour|day"""
+    region = request.args.get('region')
+    if not region:
+        profile = rtdb.reference(f"users/{session.get('user_id')}").get() or {}
+        region = user_region(profile)
+    key = climate_region_key(region)
+    resolution = request.args.get('resolution', 'hour')
+    try:
+        end = datetime.strptime(request.args['end'], "%Y-%m-%d") + timedelta(days=1) - timedelta(seconds=1) if request.args.get('end') else datetime.now()
+        start = datetime.strptime(request.args['start'], "%Y-%m-%d") if request.args.get('start') else end - timedelta(days=7)
+        points = weather_store.series(key, start, end, resolution)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify({"region": key, "resolution": resolution, "points": points})
+
 @app.route('/admin/add-climate-alert', methods=['POST'])
 @admin_required
 def add_climate_alert():
@@ -2272,6 +2557,8 @@ def banking_process_withdraw():
         rtdb.reference(f'banking_accounts/{uid}/standard_savings/{group_id}').set(new_balance)
         log_name = group['name']
     
+    record_withdrawal(rtdb, amount)
+    
     # Log withdrawal
     rtdb.reference(f'banking_transactions/{uid}').push({
         'type': 'withdraw',
@@ -2298,7 +2585,9 @@ def banking_request_loan():
         'status': 'Pending Review' if request.form.get('provider') == 'system' else 'Referred',
         'requested_at': datetime.now(eat_tz).strftime("%Y-%m-%d %H:%M:%S")
     }
-    rtdb.reference(f'banking_loans/{uid}').push(loan_data)
+    new_loan = rtdb.reference(f'banking_loans/{uid}').push(loan_data)
+    if loan_data['status'] == 'Pending Review':
+        add_pending_loan(rtdb, uid, new_loan.key, loan_data)
     
     if loan_data['provider'] == 'external_bank':
         flash("Request logged. Visit your nearest partner bank branch with your ID.", "info")
@@ -2569,4 +2858,5 @@ if __name__ == "__main__":
     print(f"\n Farmerman Systems is LIVE!")
     print(f" Click here to open: http://127.0.0.1:{port}\n")
     
+    start_scheduler()
     socketio.run(app, host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
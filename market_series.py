@@ -0,0 +1,99 @@
+"""
+Aggregated market price series for charts.
+
+Prices are bucketed by their observation date in SQLite (GROUP BY on the bucket
+start), so a client asking for a year of weekly Maize prices gets 52 points
+instead of every raw row:
+
+    version = series_version(MarketData, 'Maize (90kg)', 'Rift Valley', start, end)
+    points = price_series(MarketData, 'Maize (90kg)', 'Rift Valley', start, end, 'week')
+
+Each point carries open/high/low/close, the mean and the number of raw prices in
+the bucket. series_version() is a one-row aggregate, cheap enough to run before
+deciding whether a cached copy (ETag) is still valid.
+"""
+import hashlib
+
+from sqlalchemy import func
+
+RESOLUTIONS = ('day', 'week', 'month')
+DEFAULT_RESOLUTION = 'week'
+
+
+def bucket_expression(column, resolution):
+    """SQLite date of the bucket a date falls in: the day, the Monday of its week, or the 1st of its month."""
+    if resolution == 'day':
+        return func.date(column)
+    if resolution == 'week':
+        # 'weekday 0' moves forward to Sunday (or stays on it); six days back is that week's Monday
+        return func.date(column, 'weekday 0', '-6 days')
+    if resolution == 'month':
+        return func.date(column, 'start of month')
+    raise ValueError(f"Unknown resolution '{resolution}'")
+
+
+def _filtered(query, model, commodity, region, start, end):
+    query = query.filter(model.commodity == commodity)
+    if region:
+        query = query.filter(model.region == region)
+    # observed_on ranges use ix_market_data_observed (commodity, region, observed_on)
+    if start:
+        query = query.filter(model.observed_on >= start)
+    if end:
+        query = query.filter(model.observed_on <= end)
+    return query
+
+
+def series_version(model, commodity, region=None, start=None, end=None, resolution=DEFAULT_RESOLUTION):
+    """
+    ETag for one series: changes whenever a matching row is added, removed or edited
+    (row count, newest id, newest timestamp), or when the query itself changes.
+    """
+    count, newest_id, newest_at = _filtered(
+        model.query.with_entities(func.count(model.id), func.max(model.id), func.max(model.updated_at)),
+        model, commodity, region, start, end
+    ).one()
+    raw = f"{commodity}|{region}|{start}|{end}|{resolution}|{count}|{newest_id}|{newest_at}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def price_series(model, commodity, region=None, start=None, end=None, resolution=DEFAULT_RESOLUTION):
+    """
+    [{'period', 'open', 'high', 'low', 'close', 'mean', 'count'}] oldest first.
+    start and end are inclusive dates; region=None aggregates every region of the commodity.
+    Prices observed on the same day are ordered by id for open/close.
+    """
+    bucket = bucket_expression(model.observed_on, resolution).label('bucket')
+    groups = _filtered(
+        model.query.with_entities(
+            bucket,
+            func.min(model.price), func.max(model.price), func.avg(model.price), func.count(model.id),
+            func.min(model.observed_on), func.max(model.observed_on)
+        ),
+        model, commodity, region, start, end
+    ).group_by(bucket).order_by(bucket).all()
+    if not groups:
+        return []
+
+    # Open and close are the prices on each bucket's first and last day: one more indexed query
+    boundaries = {g[5] for g in groups} | {g[6] for g in groups}
+    price_at = {}
+    rows = _filtered(
+        model.query.with_entities(model.observed_on, model.price),
+        model, commodity, region, start, end
+    ).filter(model.observed_on.in_(boundaries)).order_by(model.observed_on, model.id).all()
+    for observed_on, price in rows:
+        price_at.setdefault(observed_on, []).append(price)
+
+    return [
+        {
+            'period': period,
+            'open': price_at[first_day][0],
+            'high': high,
+            'low': low,
+            'close': price_at[last_day][-1],
+            'mean': round(mean, 2),
+            'count': count
+        }
+        for period, low, high, mean, count, first_day, last_day in groups
+    ]
@@ -0,0 +1,160 @@
+"""
+Versioned schema migrations for farmerman.db.
+
+db.create_all() creates missing tables but never changes existing ones, so
+column and index changes to live databases are applied here instead. Every
+migration has a revision id plus upgrade/downgrade steps, and applied revisions
+are recorded in the schema_migrations table (the same idea as Alembic's
+alembic_version).
+
+    python migrations.py upgrade             # apply everything pending
+    python migrations.py downgrade 0000      # roll back to before 0001
+    python migrations.py current
+    python migrations.py history
+
+main.py runs upgrade() at startup, right after create_all(). Every worker does
+this, so upgrade and downgrade hold a lock file next to the database and read
+the applied revisions only once they have it: the first worker migrates, the
+others wait and then find nothing left to do. Every step also checks the live
+schema first, so a database created fresh from models.py gets its revisions
+recorded without changing anything.
+"""
+import argparse
+import os
+from contextlib import nullcontext
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from leader import file_lock
+
+VERSION_TABLE = 'schema_migrations'
+BASE = '0000'
+
+
+# ==========================================
+# HELPERS
+# ==========================================
+def _columns(conn, table):
+    return {c['name'] for c in inspect(conn).get_columns(table)}
+
+
+def _has_table(conn, table):
+    return inspect(conn).has_table(table)
+
+
+# ==========================================
+# REVISIONS
+# ==========================================
+def upgrade_0001(conn):
+    """market_data: observed_on date column (backfilled from updated_at) and composite series indexes."""
+    if not _has_table(conn, 'market_data'):
+        return
+    if 'observed_on' not in _columns(conn, 'market_data'):
+        conn.execute(text("ALTER TABLE market_data ADD COLUMN observed_on DATE"))
+    conn.execute(text("UPDATE market_data SET observed_on = date(updated_at) WHERE observed_on IS NULL"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_market_data_series ON market_data (commodity, region, updated_at)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_market_data_observed ON market_data (commodity, region, observed_on)"))
+    # Refresh planner statistics so SQLite picks the new indexes straight away
+    conn.execute(text("ANALYZE market_data"))
+
+
+def downgrade_0001(conn):
+    if not _has_table(conn, 'market_data'):
+        return
+    conn.execute(text("DROP INDEX IF EXISTS ix_market_data_series"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_market_data_observed"))
+    if 'observed_on' in _columns(conn, 'market_data'):
+        conn.execute(text("ALTER TABLE market_data DROP COLUMN observed_on"))
+
+
+# Oldest first: (revision, description, upgrade, downgrade)
+MIGRATIONS = [
+    ('0001', 'market_data time-series indexes and observed_on', upgrade_0001, downgrade_0001),
+]
+
+
+# ==========================================
+# RUNNER
+# ==========================================
+def _ensure_version_table(conn):
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (revision VARCHAR(32) PRIMARY KEY, applied_at DATETIME NOT NULL)"))
+
+
+def _migration_lock(engine):
+    """Serialises migrations across processes sharing the same SQLite file."""
+    database = engine.url.database
+    if not database or database == ':memory:':
+        return nullcontext()
+    return file_lock(os.path.abspath(database) + '.migrate.lock')
+
+
+def applied(engine):
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        return {row[0] for row in conn.execute(text(f"SELECT revision FROM {VERSION_TABLE}"))}
+
+
+def current(engine):
+    done = applied(engine)
+    revisions = [rev for rev, *_ in MIGRATIONS if rev in done]
+    return revisions[-1] if revisions else BASE
+
+
+def upgrade(engine, target=None):
+    """Applies every pending revision up to target (default: the newest), each in its own transaction."""
+    ran = []
+    with _migration_lock(engine):
+        # Read under the lock: a worker that waited here sees what the first one applied
+        done = applied(engine)
+        for revision, description, up, _ in MIGRATIONS:
+            if revision in done:
+                continue
+            with engine.begin() as conn:
+                up(conn)
+                conn.execute(text(f"INSERT INTO {VERSION_TABLE} (revision, applied_at) VALUES (:r, :t)"),
+                             {'r': revision, 't': datetime.utcnow()})
+            print(f"Migration {revision} applied: {description}")
+            ran.append(revision)
+            if revision == target:
+                break
+    return ran
+
+
+def downgrade(engine, target=BASE):
+    """Rolls back applied revisions newer than target, newest first."""
+    ran = []
+    with _migration_lock(engine):
+        done = applied(engine)
+        for revision, description, _, down in reversed(MIGRATIONS):
+            if revision <= target:
+                break
+            if revision not in done:
+                continue
+            with engine.begin() as conn:
+                down(conn)
+                conn.execute(text(f"DELETE FROM {VERSION_TABLE} WHERE revision = :r"), {'r': revision})
+            print(f"Migration {revision} rolled back: {description}")
+            ran.append(revision)
+    return ran
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply or roll back farmerman.db schema migrations.")
+    parser.add_argument('command', choices=['upgrade', 'downgrade', 'current', 'history'])
+    parser.add_argument('target', nargs='?', help="revision to stop at (downgrade defaults to 0000)")
+    args = parser.parse_args()
+
+    if args.command == 'history':
+        for revision, description, *_ in MIGRATIONS:
+            print(f"{revision}  {description}")
+        raise SystemExit(0)
+
+    from main import app, sqlalchemy_db
+    with app.app_context():
+        engine = sqlalchemy_db.engine
+        if args.command == 'upgrade':
+            upgrade(engine, args.target)
+        elif args.command == 'downgrade':
+            downgrade(engine, args.target or BASE)
+        print(f"Current revision: {current(engine)}")
@@ -42,6 +42,12 @@ class User(db.Model):
 # ==========================================
 class MarketData(db.Model):
     __tablename__ = 'market_data'
+    # Series lookups filter by commodity (+ region) and range over time; existing
+    # databases get these through migrations.py
+    __table_args__ = (
+        db.Index('ix_market_data_series', 'commodity', 'region', 'updated_at'),
+        db.Index('ix_market_data_observed', 'commodity', 'region', 'observed_on'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     commodity = db.Column(db.String(100), nullable=False) # e.g., "Maize (90kg)"
@@ -52,6 +58,9 @@ class MarketData(db.Model):
     currency = db.Column(db.String(10), default='KES')
     trend = db.Column(db.String(20), default='stable')    # 'up', 'down', 'stable'
     
+    # The market day the price was observed on; updated_at moves whenever the row is edited
+    observed_on = db.Column(db.Date, default=lambda: datetime.utcnow().date())
+
     # Metadata
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -87,4 +96,45 @@ class Transaction(db.Model):
 
     def __repr__(self):
         return f"<Transaction {self.transaction_reference} - {self.status}>"
-    
\ No newline at end of file
+    
+# ==========================================
+# 4. WEATHER TIME-SERIES MODELS
+# ==========================================
+class WeatherReading(db.Model):
+    """Raw, append-only weather observations. Kept for a short window, then compacted away."""
+    __tablename__ = 'weather_readings'
+    __table_args__ = (db.Index('ix_weather_readings_region_time', 'region', 'observed_at'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    region = db.Column(db.String(100), nullable=False)   # region key, e.g. "nakuru"
+    observed_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    temp = db.Column(db.Float, nullable=False)
+    humidity = db.Column(db.Float, nullable=False)
+    wind = db.Column(db.Float, nullable=False)
+    condition = db.Column(db.String(50), nullable=True)
+
+    def __repr__(self):
+        return f"<WeatherReading {self.region} @ {self.observed_at}: {self.temp}°C>"
+
+class WeatherRollup(db.Model):
+    """Hourly / daily aggregates, updated as each reading arrives. Sums are kept so means stay exact."""
+    __tablename__ = 'weather_rollups'
+    __table_args__ = (db.UniqueConstraint('region', 'resolution', 'bucket_start', name='uq_weather_rollup_bucket'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    region = db.Column(db.String(100), nullable=False)
+    resolution = db.Column(db.String(10), nullable=False)  # 'hour' or 'day'
+    bucket_start = db.Column(db.DateTime, nullable=False)
+
+    count = db.Column(db.Integer, nullable=False, default=0)
+    temp_sum = db.Column(db.Float, nullable=False, default=0.0)
+    temp_min = db.Column(db.Float, nullable=True)
+    temp_max = db.Column(db.Float, nullable=True)
+    humidity_sum = db.Column(db.Float, nullable=False, default=0.0)
+    humidity_max = db.Column(db.Float, nullable=True)
+    wind_sum = db.Column(db.Float, nullable=False, default=0.0)
+    wind_max = db.Column(db.Float, nullable=True)
+    wet_count = db.Column(db.Integer, nullable=False, default=0)  # readings reporting rain/drizzle/storm
+
+    def __repr__(self):
+        return f"<WeatherRollup {self.region} {self.resolution} {self.bucket_start}: n={self.count}>"
@@ -0,0 +1,318 @@
+"""
+Chat presence shared by every Socket.IO worker.
+
+Each worker keeps a socket count per user and publishes it as one hash that
+expires unless the worker keeps heartbeating, so a crashed worker's users drop
+offline on their own instead of staying green forever:
+
+    presence:workers          -> sorted set { worker_id: last heartbeat }
+    presence:counts:{id}      -> hash { uid: open sockets on that worker }, TTL = expiry seconds
+
+A connect or disconnect is one HINCRBY plus a HGET per live worker (in a single
+Lua call, so "first socket" / "last socket" is decided atomically), independent
+of how many users are online.
+
+With no message queue configured the same layout lives in this process
+(MemoryPresenceBackend), which is what a single gunicorn worker needs.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+
+HEARTBEAT_SECONDS = 20
+EXPIRY_SECONDS = 60
+FLUSH_SECONDS = 2
+
+
+class MemoryPresenceBackend:
+    """In-process stand-in for Redis: single worker, development and tests."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._workers = {}  # { worker_id: (expires_at, {uid: count}) }
+
+    def _live(self):
+        now = time.time()
+        for worker_id in [w for w, (expires, _) in self._workers.items() if expires < now]:
+            del self._workers[worker_id]
+        return self._workers
+
+    def publish(self, worker_id, counts, expiry):
+        with self._lock:
+            self._workers[worker_id] = (time.time() + expiry, {uid: n for uid, n in counts.items() if n > 0})
+
+    def adjust(self, worker_id, uid, delta, expiry):
+        """Moves uid's socket count on this worker by delta; returns their count across all workers."""
+        with self._lock:
+            counts = self._live().get(worker_id, (None, {}))[1]
+            counts[uid] = counts.get(uid, 0) + delta
+            if counts[uid] <= 0:
+                del counts[uid]
+            self._workers[worker_id] = (time.time() + expiry, counts)
+            return sum(c.get(uid, 0) for _, c in self._workers.values())
+
+    def socket_count(self, uid):
+        with self._lock:
+            return sum(c.get(uid, 0) for _, c in self._live().values())
+
+    def online_among(self, uids):
+        with self._lock:
+            live = self._live().values()
+            return {uid for uid in uids if any(c.get(uid) for _, c in live)}
+
+    def remove_worker(self, worker_id):
+        with self._lock:
+            self._workers.pop(worker_id, None)
+
+    def online_uids(self):
+        with self._lock:
+            return {uid for _, counts in self._live().values() for uid in counts}
+
+
+# KEYS[1] = this worker's counts, KEYS[2..] = the other live workers' counts
+# ARGV = uid, delta, expiry seconds
+ADJUST_SCRIPT = """
+local n = redis.call('HINCRBY', KEYS[1], ARGV[1], ARGV[2])
+if n <= 0 then redis.call('HDEL', KEYS[1], ARGV[1]) end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+local total = 0
+for i = 1, #KEYS do
+    total = total + tonumber(redis.call('HGET', KEYS[i], ARGV[1]) or '0')
+end
+return total
+"""
+
+
+class RedisPresenceBackend:
+    """Presence in Redis (or any Redis-compatible server), shared by all workers and nodes."""
+
+    def __init__(self, url, prefix='presence', expiry_seconds=EXPIRY_SECONDS):
+        import redis  # only needed when presence is shared between workers
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self._prefix = prefix
+        self.expiry_seconds = expiry_seconds
+        self._adjust = self._redis.register_script(ADJUST_SCRIPT)
+
+    def _counts_key(self, worker_id):
+        return f"{self._prefix}:counts:{worker_id}"
+
+    def _live_workers(self):
+        workers_key = f"{self._prefix}:workers"
+        # Workers that stopped heartbeating are pruned; their hashes have already expired
+        self._redis.zremrangebyscore(workers_key, 0, time.time() - self.expiry_seconds)
+        return self._redis.zrange(workers_key, 0, -1)
+
+    def publish(self, worker_id, counts, expiry):
+        """Full re-sync of this worker's counts (heartbeat); heals any increment lost to an error."""
+        key = self._counts_key(worker_id)
+        counts = {uid: n for uid, n in counts.items() if n > 0}
+        pipe = self._redis.pipeline()
+        pipe.delete(key)
+        if counts:
+            pipe.hset(key, mapping=counts)
+            pipe.expire(key, expiry)
+        pipe.zadd(f"{self._prefix}:workers", {worker_id: time.time()})
+        pipe.execute()
+
+    def adjust(self, worker_id, uid, delta, expiry):
+        self._redis.zadd(f"{self._prefix}:workers", {worker_id: time.time()})
+        others = [self._counts_key(w) for w in self._live_workers() if w != worker_id]
+        return int(self._adjust(keys=[self._counts_key(worker_id)] + others, args=[uid, delta, expiry]))
+
+    def socket_count(self, uid):
+        workers = self._live_workers()
+        if not workers:
+            return 0
+        pipe = self._redis.pipeline()
+        for worker_id in workers:
+            pipe.hget(self._counts_key(worker_id), uid)
+        return sum(int(n or 0) for n in pipe.execute())
+
+    def online_among(self, uids):
+        """Which of these users are online: one HMGET per live worker, O(len(uids))."""
+        uids = list(uids)
+        workers = self._live_workers()
+        if not uids or not workers:
+            return set()
+        pipe = self._redis.pipeline()
+        for worker_id in workers:
+            pipe.hmget(self._counts_key(worker_id), uids)
+        return {uid for counts in pipe.execute() for uid, n in zip(uids, counts) if n and int(n) > 0}
+
+    def remove_worker(self, worker_id):
+        pipe = self._redis.pipeline()
+        pipe.delete(self._counts_key(worker_id))
+        pipe.zrem(f"{self._prefix}:workers", worker_id)
+        pipe.execute()
+
+    def online_uids(self):
+        """Everyone online; O(online users). Request handlers use online_among() instead."""
+        workers = self._live_workers()
+        if not workers:
+            return set()
+        pipe = self._redis.pipeline()
+        for worker_id in workers:
+            pipe.hkeys(self._counts_key(worker_id))
+        return {uid for uids in pipe.execute() for uid in uids}
+
+
+def backend_for(message_queue):
+    """Redis presence when Socket.IO is fanned out through Redis, in-process otherwise."""
+    if message_queue and message_queue.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisPresenceBackend(message_queue)
+    return MemoryPresenceBackend()
+
+
+class PresenceRegistry:
+    """
+    Tracks this worker's sockets and answers "who is online" across all workers.
+    Connects and disconnects adjust the shared counts immediately; heartbeat()
+    re-publishes this worker's counts on a timer so its entry never expires while it is alive.
+    """
+
+    def __init__(self, backend, heartbeat_seconds=HEARTBEAT_SECONDS, expiry_seconds=EXPIRY_SECONDS):
+        self.backend = backend
+        self.heartbeat_seconds = heartbeat_seconds
+        self.expiry_seconds = expiry_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._lock = threading.Lock()
+        self._connections = {}  # { sid: uid } for sockets held by this worker
+        self._counts = {}       # { uid: sockets held by this worker }
+
+    def _adjust(self, uid, delta):
+        """Returns uid's socket count across all workers after the change."""
+        with self._lock:
+            local = self._counts.get(uid, 0) + delta
+            if local > 0:
+                self._counts[uid] = local
+            else:
+                self._counts.pop(uid, None)
+        try:
+            return self.backend.adjust(self.worker_id, uid, delta, self.expiry_seconds)
+        except Exception as e:
+            # The next heartbeat re-publishes the full counts, so a missed write heals itself
+            print(f"Presence update failed, using this worker's sockets only: {e}")
+            return max(local, 0)
+
+    def connect(self, sid, uid):
+        """Registers a socket. Returns True if the user was offline everywhere before it."""
+        with self._lock:
+            self._connections[sid] = uid
+        return self._adjust(uid, 1) == 1
+
+    def disconnect(self, sid):
+        """Drops a socket. Returns its uid if that user now has no sockets on any worker."""
+        with self._lock:
+            uid = self._connections.pop(sid, None)
+        if uid is None:
+            return None
+        return uid if self._adjust(uid, -1) <= 0 else None
+
+    def online_uids(self):
+        try:
+            return self.backend.online_uids()
+        except Exception as e:
+            print(f"Presence lookup failed, using this worker's sockets only: {e}")
+            with self._lock:
+                return set(self._counts)
+
+    def online_among(self, uids):
+        """The subset of uids that is online, without reading the whole online set."""
+        try:
+            return self.backend.online_among(uids)
+        except Exception as e:
+            print(f"Presence lookup failed, using this worker's sockets only: {e}")
+            with self._lock:
+                return {uid for uid in uids if uid in self._counts}
+
+    def is_online(self, uid):
+        try:
+            return self.backend.socket_count(uid) > 0
+        except Exception as e:
+            print(f"Presence lookup failed, using this worker's sockets only: {e}")
+            with self._lock:
+                return uid in self._counts
+
+    def heartbeat(self):
+        with self._lock:
+            counts = dict(self._counts)
+        try:
+            self.backend.publish(self.worker_id, counts, self.expiry_seconds)
+        except Exception as e:
+            print(f"Presence publish failed: {e}")
+
+    def run_heartbeats(self, sleep):
+        """Heartbeat loop; pass socketio.sleep so it cooperates with the async mode."""
+        while True:
+            sleep(self.heartbeat_seconds)
+            self.heartbeat()
+
+    def shutdown(self):
+        self.backend.remove_worker(self.worker_id)
+
+
+class PresenceFanout:
+    """
+    Debounced, targeted presence updates.
+
+    Status changes are queued instead of broadcast. Every flush_seconds the queue is
+    coalesced (an online/offline pair inside one window cancels out), the contacts of
+    every changed user are resolved in one lookup, and each contact receives a single
+    delta {'online': [...], 'offline': [...]} in their personal room.
+
+    Which change to queue is decided by PresenceRegistry (first / last socket across
+    all workers), so nothing here remembers what was announced: the user's first
+    socket may open on one worker and their last close on another. is_online, when
+    given, re-checks each user at flush time so two workers flushing opposite
+    changes in the wrong order still converge on the real status.
+    """
+
+    def __init__(self, contacts_for, send_delta, flush_seconds=FLUSH_SECONDS, is_online=None):
+        self.contacts_for = contacts_for  # callable: [uid] -> { uid: set(contact uids) }
+        self.send_delta = send_delta      # callable: (recipient uid, delta dict) -> None
+        self.is_online = is_online        # optional callable: uid -> bool
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._pending = {}    # { uid: 'online' | 'offline' } queued this window
+        self.flushes = 0
+        self.deltas_sent = 0
+
+    def mark(self, uid, status):
+        with self._lock:
+            queued = self._pending.get(uid)
+            if queued is not None and queued != status:
+                # Went offline and came back (or vice versa) within one window
+                del self._pending[uid]
+            else:
+                self._pending[uid] = status
+
+    def flush(self):
+        with self._lock:
+            changed, self._pending = self._pending, {}
+        if not changed:
+            return 0
+        if self.is_online:
+            changed = {uid: 'online' if self.is_online(uid) else 'offline' for uid in changed}
+
+        deltas = {}
+        for uid, contacts in self.contacts_for(list(changed)).items():
+            for contact in contacts:
+                delta = deltas.setdefault(contact, {'online': [], 'offline': []})
+                delta[changed[uid]].append(uid)
+
+        for recipient, delta in deltas.items():
+            self.send_delta(recipient, delta)
+        self.flushes += 1
+        self.deltas_sent += len(deltas)
+        return len(deltas)
+
+    def run_flushes(self, sleep):
+        """Flush loop; pass socketio.sleep so it cooperates with the async mode."""
+        while True:
+            sleep(self.flush_seconds)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Presence fan-out failed: {e}")
@@ -0,0 +1,233 @@
+"""
+RTDB query audit.
+
+Finds every order_by_child / order_by_value query in the backend and checks that
+database.rules.json declares a matching ".indexOn" at that path. Without one,
+Firebase downloads the whole node and filters it on our server.
+
+    python query_audit.py                    # every top-level module
+    python query_audit.py main.py app_backend.py
+    python query_audit.py --self-check       # run against a built-in stub
+
+Exits with status 1 if any query is missing its index, so it can gate a deploy.
+"""
+import argparse
+import ast
+import glob
+import json
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RULES_FILE = os.path.join(BASE_DIR, 'database.rules.json')
+ORDERED_QUERIES = {'order_by_child', 'order_by_value'}
+DYNAMIC = '*'
+
+
+# ==========================================
+# RULES
+# ==========================================
+def strip_comments(text):
+    """Firebase rules allow // comments, json does not. Strings are left untouched."""
+    out, i, in_string = [], 0, False
+    while i < len(text):
+        ch = text[i]
+        if in_string:
+            out.append(ch)
+            if ch == '\\':
+                out.append(text[i + 1])
+                i += 1
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+            out.append(ch)
+        elif text.startswith('//', i):
+            while i < len(text) and text[i] != '\n':
+                i += 1
+            continue
+        else:
+            out.append(ch)
+        i += 1
+    return ''.join(out)
+
+
+def load_rules(path=RULES_FILE):
+    with open(path, encoding='utf-8') as f:
+        return json.loads(strip_comments(f.read()))['rules']
+
+
+def rule_nodes(rules, segments):
+    """Every rules node a query path can land on ($wildcards match any key)."""
+    nodes = [rules]
+    for segment in segments:
+        matched = []
+        for node in nodes:
+            children = {k: v for k, v in node.items() if isinstance(v, dict)}
+            wildcards = [v for k, v in children.items() if k.startswith('$')]
+            if segment == DYNAMIC:
+                # Unknown at audit time: it could be any child
+                matched.extend(wildcards or [v for k, v in children.items() if not k.startswith('.')])
+            elif segment in children:
+                matched.append(children[segment])
+            else:
+                matched.extend(wildcards)
+        nodes = matched
+    return nodes
+
+
+def has_index(node, field):
+    declared = node.get('.indexOn', [])
+    return field in ([declared] if isinstance(declared, str) else declared)
+
+
+# ==========================================
+# SOURCE SCANNING
+# ==========================================
+def module_constants(tree):
+    """Top-level NAME = 'string' assignments, used to resolve paths like f'{STATS_ROOT}/x'."""
+    constants = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    constants[target.id] = node.value.value
+    return constants
+
+
+def path_text(expr, constants):
+    """Renders a path argument, with anything unknown at audit time as '*'."""
+    if isinstance(expr, ast.Constant) and isinstance(expr.value, str):
+        return expr.value
+    if isinstance(expr, ast.Name) and expr.id in constants:
+        return constants[expr.id]
+    if isinstance(expr, ast.JoinedStr):
+        parts = []
+        for value in expr.values:
+            if isinstance(value, ast.Constant):
+                parts.append(value.value)
+            elif isinstance(value.value, ast.Name) and value.value.id in constants:
+                parts.append(constants[value.value.id])
+            else:
+                parts.append(DYNAMIC)
+        return ''.join(parts)
+    return DYNAMIC
+
+
+def query_path(call, constants):
+    """Walks query.child(...).reference(...) back to the referenced path segments."""
+    pieces = []
+    node = call.func.value
+    while isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+        if node.func.attr in ('child', 'reference') and node.args:
+            pieces.insert(0, path_text(node.args[0], constants))
+            if node.func.attr == 'reference':
+                break
+        node = node.func.value
+    else:
+        return None  # not rooted in a .reference() call we can see
+    segments = []
+    for piece in pieces:
+        for segment in piece.strip('/').split('/'):
+            if segment:
+                segments.append(DYNAMIC if DYNAMIC in segment else segment)
+    return segments
+
+
+def find_queries(path):
+    with open(path, encoding='utf-8') as f:
+        source = f.read()
+    tree = ast.parse(source, filename=path)
+    constants = module_constants(tree)
+    for call in ast.walk(tree):
+        if not (isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute) and call.func.attr in ORDERED_QUERIES):
+            continue
+        if call.func.attr == 'order_by_value':
+            field = '.value'
+        elif call.args and isinstance(call.args[0], ast.Constant):
+            field = call.args[0].value
+        else:
+            field = None  # passed in by the caller
+        yield {
+            'file': os.path.relpath(path, BASE_DIR),
+            'line': call.lineno,
+            'segments': query_path(call, constants),
+            'field': field
+        }
+
+
+def audit(paths, rules):
+    results = []
+    for path in paths:
+        for query in find_queries(path):
+            segments = query['segments']
+            query['path'] = '/'.join(segments) if segments is not None else '?'
+            if segments is None:
+                query['status'] = 'unverified'
+                query['detail'] = 'path not resolvable from source'
+            elif query['field'] is None:
+                query['status'] = 'unverified'
+                query['detail'] = 'field chosen at runtime'
+            else:
+                nodes = rule_nodes(rules, segments)
+                if nodes and all(has_index(node, query['field']) for node in nodes):
+                    query['status'] = 'ok'
+                    query['detail'] = ''
+                else:
+                    query['status'] = 'missing'
+                    query['detail'] = f'add ".indexOn": ["{query["field"]}"] at /{query["path"]}'
+            results.append(query)
+    return results
+
+
+def report(results):
+    for r in results:
+        print(f"[{r['status'].upper():<10}] {r['file']}:{r['line']}  /{r['path']} by '{r['field'] or '?'}'  {r['detail']}".rstrip())
+    missing = sum(1 for r in results if r['status'] == 'missing')
+    print(f"\n{len(results)} ordered queries, {missing} missing an index.")
+    return missing
+
+
+# ==========================================
+# SELF CHECK (local stub, no emulator needed)
+# ==========================================
+STUB_SOURCE = '''
+ROOT = 'orders'
+def a(rtdb): return rtdb.reference(f'{ROOT}/open').order_by_child('created_at').get()
+def b(rtdb, uid): return rtdb.reference(f'baskets/{uid}').order_by_child('price').get()
+def c(rtdb): return rtdb.reference('users').child('x').order_by_value().get()
+def d(rtdb, field): return rtdb.reference('users').order_by_child(field).get()
+'''
+STUB_RULES = {
+    'orders': {'open': {'.indexOn': ['created_at']}},
+    'baskets': {'$uid': {'.indexOn': 'quantity'}},
+    'users': {'$uid': {'.indexOn': ['.value']}}
+}
+
+
+def self_check():
+    import tempfile
+    with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False) as f:
+        f.write(STUB_SOURCE)
+    try:
+        statuses = [r['status'] for r in audit([f.name], STUB_RULES)]
+    finally:
+        os.unlink(f.name)
+    expected = ['ok', 'missing', 'ok', 'unverified']
+    assert statuses == expected, f"expected {expected}, got {statuses}"
+    print("Self-check passed: resolved, missing, wildcard and runtime-field queries classified correctly.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report RTDB queries that lack an .indexOn rule.")
+    parser.add_argument('files', nargs='*', help="Python files to scan (default: every top-level module)")
+    parser.add_argument('--rules', default=RULES_FILE)
+    parser.add_argument('--self-check', action='store_true')
+    args = parser.parse_args()
+
+    if args.self_check:
+        self_check()
+        sys.exit(0)
+
+    files = args.files or sorted(glob.glob(os.path.join(BASE_DIR, '*.py')))
+    sys.exit(1 if report(audit(files, load_rules(args.rules))) else 0)
@@ -0,0 +1,196 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+# ==========================================
+# HOT NODE TTLs (seconds)
+# ==========================================
+# Only paths under these nodes are cached. Anything else goes straight to Firebase.
+DEFAULT_TTLS = {
+    'users': 30,
+    'academy_courses': 120,
+    'market_data': 60,
+    'site_content': 300,
+    'user_index': 30,
+    'forecasts': 300,
+}
+
+DEFAULT_MAX_ENTRIES = 256
+
+
+def _normalize(path):
+    return str(path or '').strip('/')
+
+
+def _overlaps(a, b):
+    """True if one path is the same as, an ancestor of, or a descendant of the other."""
+    if a == b or not a or not b:
+        return True
+    return a.startswith(b + '/') or b.startswith(a + '/')
+
+
+class RTDBCache:
+    """
+    Read-through cache in front of firebase_admin.db.
+    Drop-in replacement for the module: rtdb.reference(path).get() is served from
+    memory while fresh, and writes made through the returned references invalidate it.
+    """
+
+    def __init__(self, db_module, ttls=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self._db = db_module
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # { 'path': (expires_at, value) }
+        # Paths with a load in flight: { 'path': [loads_in_flight, generation] }.
+        # A write bumps the generation so the pre-write value is never stored.
+        self._loading = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __getattr__(self, name):
+        # Anything we don't wrap (transactions helpers, exceptions, etc.) comes from firebase_admin.db
+        return getattr(self._db, name)
+
+    def reference(self, path='/', **kwargs):
+        return CachedReference(self, self._db.reference(path, **kwargs), _normalize(path))
+
+    def ttl_for(self, path):
+        """Returns the TTL of the longest configured prefix covering this path, or None."""
+        best, best_len = None, -1
+        for prefix, ttl in self.ttls.items():
+            prefix = _normalize(prefix)
+            if (path == prefix or path.startswith(prefix + '/')) and len(prefix) > best_len:
+                best, best_len = ttl, len(prefix)
+        return best
+
+    def fetch(self, path, loader):
+        ttl = self.ttl_for(path)
+        if not ttl:
+            return loader()
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                # Routes decorate the dicts they get back, so never hand out the cached object
+                return copy.deepcopy(entry[1])
+            self.misses += 1
+            loading = self._loading.setdefault(path, [0, 0])
+            loading[0] += 1
+            generation = loading[1]
+
+        try:
+            value = loader()
+        except Exception:
+            with self._lock:
+                self._finish_load(path)
+            raise
+
+        with self._lock:
+            # Invalidated while the read was in flight (gevent yields during the HTTPS call)
+            if self._loading[path][1] == generation:
+                self._entries[path] = (time.monotonic() + ttl, copy.deepcopy(value))
+                self._entries.move_to_end(path)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+            self._finish_load(path)
+        return value
+
+    def _finish_load(self, path):
+        loading = self._loading[path]
+        loading[0] -= 1
+        if not loading[0]:
+            del self._loading[path]
+
+    def invalidate(self, path=''):
+        path = _normalize(path)
+        with self._lock:
+            stale = [key for key in self._entries if _overlaps(key, path)]
+            for key in stale:
+                del self._entries[key]
+            for key, loading in self._loading.items():
+                if _overlaps(key, path):
+                    loading[1] += 1
+            self.invalidations += len(stale)
+
+    def clear(self):
+        self.invalidate('')
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+class CachedReference:
+    """Wraps a firebase_admin.db.Reference so reads hit the cache and writes invalidate it."""
+
+    def __init__(self, cache, ref, path):
+        self._cache = cache
+        self._ref = ref
+        self._path = path
+
+    def __getattr__(self, name):
+        # Queries (order_by_child, limit_to_last, ...) are passed through uncached
+        return getattr(self._ref, name)
+
+    def get(self, *args, **kwargs):
+        if args or kwargs:
+            # etag / shallow reads have different return shapes, so skip the cache
+            return self._ref.get(*args, **kwargs)
+        return self._cache.fetch(self._path, self._ref.get)
+
+    def child(self, path):
+        return CachedReference(self._cache, self._ref.child(path), _normalize(f"{self._path}/{_normalize(path)}"))
+
+    def set(self, value):
+        try:
+            return self._ref.set(value)
+        finally:
+            self._cache.invalidate(self._path)
+
+    def update(self, value):
+        try:
+            return self._ref.update(value)
+        finally:
+            self._cache.invalidate(self._path)
+
+    def push(self, value=''):
+        try:
+            new_ref = self._ref.push(value)
+        finally:
+            self._cache.invalidate(self._path)
+        return CachedReference(self._cache, new_ref, _normalize(f"{self._path}/{new_ref.key}"))
+
+    def delete(self):
+        try:
+            return self._ref.delete()
+        finally:
+            self._cache.invalidate(self._path)
+
+    def set_if_unchanged(self, expected_etag, value):
+        try:
+            return self._ref.set_if_unchanged(expected_etag, value)
+        finally:
+            self._cache.invalidate(self._path)
+
+    def transaction(self, transaction_update):
+        try:
+            return self._ref.transaction(transaction_update)
+        finally:
+            self._cache.invalidate(self._path)
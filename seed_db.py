@@ -1,45 +1,132 @@
+import argparse
+import time
 import pandas as pd
 from datetime import datetime
-from main import app, db
-from models import MarketData, User  # <-- This is the crucial fix!
+from main import app, rtdb
+from models import db, MarketData, User  # <-- This is the crucial fix!
+from user_index import index_key
 
-def load_csv_to_db(filepath):
-    # Read the CSV using the newly installed pandas library
-    df = pd.read_csv(filepath)
-    
-    with app.app_context():
-        # Check if we have an admin user to attach the data to
-        admin = User.query.first()
-        if not admin:
-            # Create a dummy admin if one doesn't exist
-            admin = User(full_name="System Admin", email="admin@farmermansystems.com", password_hash="dummy")
-            db.session.add(admin)
-            db.session.commit()
-
-        # Loop through the CSV and create database records
-        for index, row in df.iterrows():
-            date_obj = datetime.strptime(row['date'], '%Y-%m-%d')
-            
-            # Create a new MarketData record
-            new_data = MarketData(
-                commodity=row['commodity'],
-                region=row['region'],
-                price=row['price'],
-                currency=row['currency'],
-                updated_at=date_obj,
-                posted_by=admin.id
-            )
-            db.session.add(new_data)
-        
-        # Save all records to the database
+DEFAULT_CHUNK_SIZE = 5000
+REQUIRED_COLUMNS = ['date', 'commodity', 'region', 'price']
+
+
+def _get_admin_id():
+    # Check if we have an admin user to attach the data to
+    admin = User.query.first()
+    if not admin:
+        # Create a dummy admin if one doesn't exist
+        admin = User(full_name="System Admin", email="admin@farmermansystems.com", password_hash="dummy")
+        db.session.add(admin)
         db.session.commit()
-        print(f"Successfully loaded {len(df)} records from {filepath} into the database!")
+    return admin.id
+
+
+def _existing_sqlite_keys(commodities):
+    """(commodity, region, date) triples already stored for these commodities."""
+    rows = db.session.query(MarketData.commodity, MarketData.region, MarketData.observed_on) \
+        .filter(MarketData.commodity.in_(list(commodities))).all()
+    return {(c, r, d) for c, r, d in rows if d}
+
+
+def _clean_chunk(chunk):
+    """Normalises one CSV chunk and drops rows that repeat a (commodity, region, date) within it."""
+    chunk = chunk.dropna(subset=REQUIRED_COLUMNS)
+    chunk = chunk.assign(
+        commodity=chunk['commodity'].astype(str).str.strip(),
+        region=chunk['region'].astype(str).str.strip(),
+        date=pd.to_datetime(chunk['date'], format='%Y-%m-%d').dt.date,
+        price=chunk['price'].astype(float),
+        currency=chunk['currency'].fillna('KES') if 'currency' in chunk else 'KES'
+    )
+    return chunk.drop_duplicates(subset=['commodity', 'region', 'date'], keep='last')
+
+
+def market_data_key(commodity, region, date):
+    """Deterministic RTDB key, so re-running an import overwrites instead of duplicating."""
+    return index_key(f"{commodity}|{region}|{date}").replace(' ', '_')
+
+
+def load_csv_to_db(filepath, target='sqlite', chunksize=DEFAULT_CHUNK_SIZE):
+    """
+    Streams a price CSV into SQLite (MarketData) and/or the RTDB 'market_data' node.
+    Reads in chunks, skips (commodity, region, date) rows that already exist,
+    and writes each chunk with a single bulk insert / multi-path update.
+    """
+    to_sqlite = target in ('sqlite', 'both')
+    to_rtdb = target in ('rtdb', 'both')
+    started = time.perf_counter()
+    read_rows = inserted_rows = 0
+
+    with app.app_context():
+        admin_id = _get_admin_id() if to_sqlite else None
+        seen_sqlite = set()
+        known_commodities = set()
+
+        for chunk in pd.read_csv(filepath, chunksize=chunksize):
+            read_rows += len(chunk)
+            chunk = _clean_chunk(chunk)
+
+            if to_sqlite:
+                new_commodities = set(chunk['commodity']) - known_commodities
+                if new_commodities:
+                    seen_sqlite |= _existing_sqlite_keys(new_commodities)
+                    known_commodities |= new_commodities
+
+                mappings = []
+                for commodity, region, date, price, currency in zip(chunk['commodity'], chunk['region'], chunk['date'], chunk['price'], chunk['currency']):
+                    key = (commodity, region, date)
+                    if key in seen_sqlite:
+                        continue
+                    seen_sqlite.add(key)
+                    mappings.append({
+                        'commodity': commodity,
+                        'region': region,
+                        'price': price,
+                        'currency': currency,
+                        'observed_on': date,
+                        'updated_at': datetime.combine(date, datetime.min.time()),
+                        'posted_by': admin_id
+                    })
+                if mappings:
+                    db.session.bulk_insert_mappings(MarketData, mappings)
+                    db.session.commit()
+                inserted_rows += len(mappings)
+
+            if to_rtdb:
+                updates = {
+                    market_data_key(commodity, region, date): {
+                        'commodity': commodity,
+                        'region': region,
+                        'price': price,
+                        'currency': currency,
+                        'trend': 'stable',
+                        'updated_at': f"{date} 00:00:00"
+                    }
+                    for commodity, region, date, price, currency in zip(chunk['commodity'], chunk['region'], chunk['date'], chunk['price'], chunk['currency'])
+                }
+                if updates:
+                    rtdb.reference('market_data').update(updates)
+                if not to_sqlite:
+                    inserted_rows += len(updates)
+
+    elapsed = time.perf_counter() - started
+    rate = read_rows / elapsed if elapsed else 0.0
+    print(f"Successfully loaded {inserted_rows} new records ({read_rows} read) from {filepath} into {target} "
+          f"in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+    return {'read': read_rows, 'inserted': inserted_rows, 'seconds': elapsed, 'rows_per_second': rate}
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-load market price CSVs.")
+    parser.add_argument('files', nargs='*', default=['data/maize_prices.csv', 'data/beans_prices.csv'])
+    parser.add_argument('--target', choices=['sqlite', 'rtdb', 'both'], default='sqlite')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
     # Ensure your database tables exist
     with app.app_context():
         db.create_all()
-        
-    # Load both CSV files
-    load_csv_to_db('data/maize_prices.csv')
-    load_csv_to_db('data/beans_prices.csv')
\ No newline at end of file
+
+    # Load every CSV file
+    for path in args.files:
+        load_csv_to_db(path, target=args.target, chunksize=args.chunksize)
@@ -12,6 +12,11 @@ socket.on('connect_error', (err) => {
 let currentActiveChatId = null;
 let typingTimeout;
 
+// History paging: key of the oldest loaded message, and whether the server has more above it
+let historyCursor = null;
+let historyHasMore = false;
+let loadingOlder = false;
+
 // --- 1. KEYBOARD FIX & 20 THEMES ---
 const allThemes = [
     'theme-green', 'theme-dark-green', 'theme-light-green', 
@@ -65,29 +70,56 @@ document.addEventListener('DOMContentLoaded', () => {
     
     const mediaUpload = document.getElementById('media-upload');
     if (mediaUpload) mediaUpload.addEventListener('change', handleMediaUpload);
+
+    // Pull the previous page of history when the user scrolls to the top
+    const msgBox = document.getElementById('chat-messages');
+    if (msgBox) {
+        msgBox.addEventListener('scroll', () => {
+            if (msgBox.scrollTop < 40) loadOlderMessages();
+        });
+    }
 });
 
 // --- 2. SOCKET EVENTS ---
-socket.on('refresh_contacts', () => {
-    if (!currentActiveChatId && !window.location.pathname.includes('dashboard')) {
-        window.location.reload(); 
-    }
+// Batched presence changes for my contacts: { online: [uids], offline: [uids] }
+socket.on('presence_delta', function(delta) {
+    delta.online.forEach(uid => setStatusDot(uid, true));
+    delta.offline.forEach(uid => setStatusDot(uid, false));
 });
 
-socket.on('user_status', function(data) {
-    const statusDot = document.getElementById(`status-${data.uid}`);
+function setStatusDot(uid, isOnline) {
+    const statusDot = document.getElementById(`status-${uid}`);
     if (statusDot) {
-        statusDot.style.background = data.status === 'online' ? '#198754' : '#6c757d';
+        statusDot.style.background = isOnline ? '#198754' : '#6c757d';
+        statusDot.classList.toggle('status-pulse', isOnline);
     }
-});
+}
 
-socket.on('chat_history', function(messages) {
+socket.on('chat_history', function(page) {
     const msgBox = document.getElementById('chat-messages');
     if(msgBox) msgBox.innerHTML = ''; 
-    messages.forEach(msg => appendMessage(msg));
+    historyCursor = page.cursor;
+    historyHasMore = page.has_more;
+    loadingOlder = false;
+    page.messages.forEach(msg => appendMessage(msg));
     scrollToBottom();
 });
 
+socket.on('older_messages', function(page) {
+    // Ignore a late page for a chat the user has already left
+    if (page.target_uid !== currentActiveChatId) return;
+    const msgBox = document.getElementById('chat-messages');
+    loadingOlder = false;
+    historyCursor = page.cursor;
+    historyHasMore = page.has_more;
+    if (!msgBox) return;
+
+    // Prepend newest-first so the page ends up in order, then keep the viewport where it was
+    const previousHeight = msgBox.scrollHeight;
+    page.messages.slice().reverse().forEach(msg => appendMessage(msg, true));
+    msgBox.scrollTop += msgBox.scrollHeight - previousHeight;
+});
+
 socket.on('receive_message', function(msg) {
     appendMessage(msg);
     scrollToBottom();
@@ -104,7 +136,7 @@ socket.on('update_unread_badge', function(data) {
     const badge = document.getElementById(`unread-badge-${data.sender_id}`);
     if (badge) {
         // Update the number inside the red bubble
-        badge.innerText = data.count;
+        badge.innerText = (parseInt(badge.innerText, 10) || 0) + data.increment;
         // Make the bubble visible
         badge.classList.remove('d-none');
         
@@ -116,6 +148,8 @@ socket.on('update_unread_badge', function(data) {
 
 socket.on('chat_cleared', (data) => {
     const msgBox = document.getElementById('chat-messages');
+    historyCursor = null;
+    historyHasMore = false;
     if (msgBox) {
         let msg = data.mode === 'all' 
             ? "Chat history was permanently cleared for everyone." 
@@ -173,6 +207,9 @@ function openChatMobile(targetUid, targetName) {
     }
 
     document.getElementById('chat-messages').innerHTML = '';
+    historyCursor = null;
+    historyHasMore = false;
+    loadingOlder = false;
     
     // This tells the backend you entered the room (and the backend will reset the DB count to 0)
     socket.emit('join_chat', { target_uid: targetUid });
@@ -186,7 +223,13 @@ function closeChatMobile() {
     currentActiveChatId = null; 
 }
 
-function appendMessage(msg) {
+function loadOlderMessages() {
+    if (!currentActiveChatId || !historyHasMore || !historyCursor || loadingOlder) return;
+    loadingOlder = true;
+    socket.emit('load_older', { target_uid: currentActiveChatId, cursor: historyCursor });
+}
+
+function appendMessage(msg, prepend = false) {
     const msgBox = document.getElementById('chat-messages');
     if (!msgBox) return;
     
@@ -213,7 +256,7 @@ function appendMessage(msg) {
             </div>
         </div>
     `;
-    msgBox.insertAdjacentHTML('beforeend', html);
+    msgBox.insertAdjacentHTML(prepend ? 'afterbegin' : 'beforeend', html);
 }
 
 function scrollToBottom() {
@@ -0,0 +1,165 @@
+"""
+Running aggregates for the admin dashboard.
+
+    stats/revenue                      -> float, sum of every completed transaction
+    stats/deposits                     -> float, sum of all banking balances
+    stats/pending_loans/{loan_id}      -> loan record (+ uid) while it is 'Pending Review'
+    stats/recent_transactions/{pushid} -> lightweight feed of completed transactions
+    stats/reconciled_at                -> set by reconcile_stats(); counters only move once it exists
+
+The counters are bumped with RTDB transactions at the point where the money moves,
+so the dashboard never has to walk the ledger. reconcile_stats() rebuilds
+everything from the source nodes if they ever drift, field by field: counters
+are corrected with compare-and-set writes that keep any bump landing during the
+rebuild, and loans or feed entries added meanwhile are left in place.
+"""
+
+from datetime import datetime
+
+STATS_ROOT = 'stats'
+RECENT_FEED_SIZE = 100
+
+
+def _bump(rtdb, name, delta):
+    # Until the first rebuild the counters don't hold the history yet; bumping one would
+    # make it look like a real total. reconcile_stats() will count this movement from the ledger.
+    if rtdb.reference(f'{STATS_ROOT}/reconciled_at').get() is None:
+        return None
+
+    def apply(current):
+        return round(float(current or 0.0) + float(delta), 2)
+    return rtdb.reference(f'{STATS_ROOT}/{name}').transaction(apply)
+
+
+def record_revenue(rtdb, uid, amount, plan_id, date):
+    _bump(rtdb, 'revenue', amount)
+    rtdb.reference(f'{STATS_ROOT}/recent_transactions').push({
+        'uid': uid,
+        'amount': amount,
+        'plan': plan_id,
+        'date': date
+    })
+
+
+def record_deposit(rtdb, amount):
+    _bump(rtdb, 'deposits', amount)
+
+
+def record_withdrawal(rtdb, amount):
+    _bump(rtdb, 'deposits', -float(amount))
+
+
+def add_pending_loan(rtdb, uid, loan_id, loan_data):
+    rtdb.reference(f'{STATS_ROOT}/pending_loans/{loan_id}').set({**loan_data, 'uid': uid})
+
+
+def resolve_pending_loan(rtdb, loan_id):
+    rtdb.reference(f'{STATS_ROOT}/pending_loans/{loan_id}').delete()
+
+
+def is_reconciled(rtdb):
+    return rtdb.reference(f'{STATS_ROOT}/reconciled_at').get() is not None
+
+
+def load_dashboard_stats(rtdb, recent_limit=5):
+    """Reads the aggregates for the admin dashboard (rebuilt by the reconcile job, never here)."""
+    revenue = rtdb.reference(f'{STATS_ROOT}/revenue').get()
+
+    recent = rtdb.reference(f'{STATS_ROOT}/recent_transactions').order_by_child('date').limit_to_last(recent_limit).get() or {}
+    recent_list = sorted(recent.values(), key=lambda x: x.get('date', ''), reverse=True)
+
+    return {
+        'revenue': float(revenue or 0.0),
+        'deposits': float(rtdb.reference(f'{STATS_ROOT}/deposits').get() or 0.0),
+        'pending_loans': rtdb.reference(f'{STATS_ROOT}/pending_loans').get() or {},
+        'recent_transactions': recent_list
+    }
+
+
+def _correct_counter(rtdb, name, rebuilt):
+    """
+    Sets a counter to its rebuilt value plus whatever was bumped since the snapshot,
+    using compare-and-set so a concurrent _bump transaction is never overwritten.
+    """
+    ref = rtdb.reference(f'{STATS_ROOT}/{name}')
+    snapshot, etag = ref.get(etag=True)
+    current = snapshot
+    while True:
+        value = round(rebuilt + float(current or 0.0) - float(snapshot or 0.0), 2)
+        ok, current, etag = ref.set_if_unchanged(etag, value)
+        if ok:
+            return value
+
+
+def _ledger_totals(rtdb):
+    txns = rtdb.reference('completed_transactions').get() or {}
+    revenue = 0.0
+    feed = []
+    for uid, u_txns in txns.items():
+        if not isinstance(u_txns, dict):
+            continue
+        for t in u_txns.values():
+            revenue += float(t.get('amount', 0))
+            feed.append({'uid': uid, 'amount': t.get('amount', 0), 'plan': t.get('plan_purchased', 'Pro'), 'date': t.get('date', '')})
+    feed.sort(key=lambda x: x['date'])
+
+    deposits = 0.0
+    for acc in (rtdb.reference('banking_accounts').get() or {}).values():
+        if not isinstance(acc, dict):
+            continue
+        deposits += float(acc.get('emergency_fund', 0.0))
+        for grp_balance in (acc.get('standard_savings') or {}).values():
+            deposits += float(grp_balance)
+
+    pending_loans = {}
+    for uid, user_loans in (rtdb.reference('banking_loans').get() or {}).items():
+        if not isinstance(user_loans, dict):
+            continue
+        for loan_id, loan_data in user_loans.items():
+            if isinstance(loan_data, dict) and loan_data.get('status') == 'Pending Review':
+                pending_loans[loan_id] = {**loan_data, 'uid': uid}
+    return revenue, deposits, pending_loans, feed
+
+
+def reconcile_stats(rtdb):
+    """
+    Rebuilds the stats node from completed_transactions, banking_accounts and banking_loans.
+    Nothing is written with a whole-node set, so movements recorded while the ledger
+    is being read survive the rebuild.
+    """
+    # Feed entries that exist now are covered by the ledger read below; later pushes are kept
+    old_feed = rtdb.reference(f'{STATS_ROOT}/recent_transactions').get(shallow=True) or {}
+    revenue, deposits, pending_loans, feed = _ledger_totals(rtdb)
+
+    # Counters: rebuilt value + any bump that landed since the ledger was read
+    _correct_counter(rtdb, 'revenue', revenue)
+    _correct_counter(rtdb, 'deposits', deposits)
+
+    # Pending loans: add what the ledger has; drop a stale entry only if its loan really isn't pending
+    # (one added after the ledger read is missing from pending_loans but still pending at the source)
+    loan_updates = dict(pending_loans)
+    for loan_id, entry in (rtdb.reference(f'{STATS_ROOT}/pending_loans').get() or {}).items():
+        if loan_id in pending_loans:
+            continue
+        uid = entry.get('uid') if isinstance(entry, dict) else None
+        source = rtdb.reference(f'banking_loans/{uid}/{loan_id}').get() if uid else None
+        if not isinstance(source, dict) or source.get('status') != 'Pending Review':
+            loan_updates[loan_id] = None
+    if loan_updates:
+        rtdb.reference(f'{STATS_ROOT}/pending_loans').update(loan_updates)
+
+    # The feed is only ever read newest-first, so keep the rebuilt copy short
+    feed_updates = {key: None for key in old_feed}
+    feed_updates.update({f'r{i:04d}': entry for i, entry in enumerate(feed[-RECENT_FEED_SIZE:])})
+    if feed_updates:
+        rtdb.reference(f'{STATS_ROOT}/recent_transactions').update(feed_updates)
+
+    # Last: from here on _bump keeps the counters moving
+    rtdb.reference(f'{STATS_ROOT}/reconciled_at').set(datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    return {'revenue': revenue, 'deposits': deposits, 'pending_loans': len(pending_loans)}
+
+
+if __name__ == "__main__":
+    from main import rtdb
+    totals = reconcile_stats(rtdb)
+    print(f"Stats rebuilt: revenue={totals['revenue']:,.2f}, deposits={totals['deposits']:,.2f}, pending loans={totals['pending_loans']}")
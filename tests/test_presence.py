@@ -0,0 +1,234 @@
+"""
+Presence across tabs and workers, against the in-memory backend.
+
+Set TEST_REDIS_URL (e.g. redis://localhost:6379/15) to run the same cases
+against Redis as well, which exercises ADJUST_SCRIPT.
+"""
+import os
+import uuid
+
+import pytest
+
+import presence
+from presence import MemoryPresenceBackend, PresenceFanout, PresenceRegistry, RedisPresenceBackend
+
+REDIS_URL = os.environ.get('TEST_REDIS_URL')
+
+
+class Clock:
+    """Stands in for time.time() inside presence so expiry can be tested without sleeping."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(presence.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture(params=['memory', 'redis'])
+def backend(request, clock):
+    if request.param == 'memory':
+        yield MemoryPresenceBackend()
+        return
+    if not REDIS_URL:
+        pytest.skip("TEST_REDIS_URL not set")
+    # A fresh prefix per test keeps runs independent on a shared server
+    backend = RedisPresenceBackend(REDIS_URL, prefix=f"presence-test:{uuid.uuid4().hex}")
+    yield backend
+    keys = backend._redis.keys(f"{backend._prefix}:*")
+    if keys:
+        backend._redis.delete(*keys)
+
+
+@pytest.fixture
+def memory_only_backend(clock):
+    """Expiry cases move the fake clock, which a real Redis TTL would not follow."""
+    return MemoryPresenceBackend()
+
+
+def worker(backend, expiry_seconds=60):
+    return PresenceRegistry(backend, expiry_seconds=expiry_seconds)
+
+
+# ==========================================
+# PRESENCE REGISTRY
+# ==========================================
+def test_second_tab_is_not_a_new_arrival(backend):
+    registry = worker(backend)
+
+    assert registry.connect('sid-1', 'alice') is True
+    assert registry.connect('sid-2', 'alice') is False
+    assert registry.is_online('alice')
+
+
+def test_user_goes_offline_only_when_last_tab_closes(backend):
+    registry = worker(backend)
+    registry.connect('sid-1', 'alice')
+    registry.connect('sid-2', 'alice')
+
+    assert registry.disconnect('sid-1') is None
+    assert registry.is_online('alice')
+    assert registry.disconnect('sid-2') == 'alice'
+    assert not registry.is_online('alice')
+
+
+def test_unknown_socket_disconnect_is_ignored(backend):
+    registry = worker(backend)
+
+    assert registry.disconnect('never-connected') is None
+
+
+def test_first_and_last_socket_are_decided_across_workers(backend):
+    a, b = worker(backend), worker(backend)
+
+    assert a.connect('sid-a', 'alice') is True
+    # Already online through worker a
+    assert b.connect('sid-b', 'alice') is False
+
+    # Closing the tab on a leaves the one on b open
+    assert a.disconnect('sid-a') is None
+    assert a.is_online('alice') and b.is_online('alice')
+
+    assert b.disconnect('sid-b') == 'alice'
+    assert not a.is_online('alice')
+
+
+def test_every_worker_sees_users_on_the_others(backend):
+    a, b = worker(backend), worker(backend)
+    a.connect('sid-a', 'alice')
+    b.connect('sid-b', 'bob')
+
+    assert a.online_among(['alice', 'bob', 'carol']) == {'alice', 'bob'}
+    assert b.online_uids() == {'alice', 'bob'}
+
+
+def test_dead_worker_users_expire(memory_only_backend, clock):
+    alive, dead = worker(memory_only_backend, expiry_seconds=60), worker(memory_only_backend, expiry_seconds=60)
+    alive.connect('sid-1', 'alice')
+    dead.connect('sid-2', 'bob')
+
+    clock.now += 30
+    alive.heartbeat()
+    assert alive.online_among(['alice', 'bob']) == {'alice', 'bob'}
+
+    # dead stopped heartbeating 61s ago; alive heartbeated 31s ago
+    clock.now += 31
+    assert alive.is_online('alice')
+    assert not alive.is_online('bob')
+    assert alive.online_uids() == {'alice'}
+
+
+def test_heartbeat_restores_counts_after_expiry(memory_only_backend, clock):
+    registry = worker(memory_only_backend, expiry_seconds=60)
+    registry.connect('sid-1', 'alice')
+
+    clock.now += 61
+    assert not registry.is_online('alice')
+
+    # A worker that was only slow re-publishes everything it holds
+    registry.heartbeat()
+    assert registry.is_online('alice')
+    assert registry.disconnect('sid-1') == 'alice'
+
+
+def test_shutdown_takes_the_workers_users_offline(backend):
+    a, b = worker(backend), worker(backend)
+    a.connect('sid-a', 'alice')
+    b.connect('sid-b', 'bob')
+
+    a.shutdown()
+
+    assert b.online_uids() == {'bob'}
+
+
+# ==========================================
+# PRESENCE FAN-OUT
+# ==========================================
+class Outbox:
+    def __init__(self):
+        self.sent = []
+
+    def __call__(self, recipient, delta):
+        self.sent.append((recipient, delta))
+
+
+def contacts_of(graph):
+    return lambda uids: {uid: graph.get(uid, set()) for uid in uids}
+
+
+def test_flush_sends_one_delta_per_contact():
+    outbox = Outbox()
+    fanout = PresenceFanout(contacts_of({'alice': {'bob', 'carol'}, 'dave': {'bob'}}), outbox)
+
+    fanout.mark('alice', 'online')
+    fanout.mark('dave', 'offline')
+
+    assert fanout.flush() == 2
+    sent = dict(outbox.sent)
+    assert sent['bob'] == {'online': ['alice'], 'offline': ['dave']}
+    assert sent['carol'] == {'online': ['alice'], 'offline': []}
+
+
+def test_online_offline_pair_in_one_window_cancels_out():
+    outbox = Outbox()
+    fanout = PresenceFanout(contacts_of({'alice': {'bob'}}), outbox)
+
+    fanout.mark('alice', 'online')
+    fanout.mark('alice', 'offline')
+
+    assert fanout.flush() == 0
+    assert outbox.sent == []
+
+
+def test_repeated_status_is_sent_once():
+    outbox = Outbox()
+    fanout = PresenceFanout(contacts_of({'alice': {'bob'}}), outbox)
+
+    fanout.mark('alice', 'online')
+    fanout.mark('alice', 'online')
+    fanout.flush()
+
+    assert outbox.sent == [('bob', {'online': ['alice'], 'offline': []})]
+    assert fanout.flush() == 0
+
+
+def test_flush_resolves_status_from_registry():
+    # Worker b queued "offline" but alice reconnected on worker a before the flush
+    backend = MemoryPresenceBackend()
+    a, b = worker(backend), worker(backend)
+    b.connect('sid-b', 'alice')
+    outbox = Outbox()
+    fanout = PresenceFanout(contacts_of({'alice': {'bob'}}), outbox, is_online=b.is_online)
+
+    assert b.disconnect('sid-b') == 'alice'
+    fanout.mark('alice', 'offline')
+    a.connect('sid-a', 'alice')
+    fanout.flush()
+
+    assert outbox.sent == [('bob', {'online': ['alice'], 'offline': []})]
+
+
+def test_end_to_end_multi_tab_announces_once():
+    backend = MemoryPresenceBackend()
+    registry = worker(backend)
+    outbox = Outbox()
+    fanout = PresenceFanout(contacts_of({'alice': {'bob'}}), outbox, is_online=registry.is_online)
+
+    for sid in ('tab-1', 'tab-2', 'tab-3'):
+        if registry.connect(sid, 'alice'):
+            fanout.mark('alice', 'online')
+    fanout.flush()
+    for sid in ('tab-1', 'tab-2'):
+        gone = registry.disconnect(sid)
+        if gone:
+            fanout.mark(gone, 'offline')
+    fanout.flush()
+
+    assert outbox.sent == [('bob', {'online': ['alice'], 'offline': []})]
@@ -0,0 +1,183 @@
+"""
+Denormalized secondary indexes over the 'users' node.
+
+Layout (all maintained alongside users/{uid}):
+    user_index/by_role/{role}/{uid}          -> user card
+    user_index/by_tier/{tier}/{uid}          -> user card
+    user_index/by_location/{location}/{uid}  -> user card
+
+A "card" is the handful of profile fields the list pages actually render,
+so a lookup costs O(matches) instead of a full 'users' download.
+"""
+
+INDEX_ROOT = 'user_index'
+
+# Profile fields copied into every index entry
+CARD_FIELDS = ('full_name', 'email', 'role', 'subscription_tier', 'organization', 'location', 'phone', 'created_at')
+
+# Every role a profile can carry, i.e. every by_role bucket
+USER_ROLES = ('buyer', 'seller', 'client', 'tutor', 'admin')
+
+# Which profile field feeds which index
+INDEXED_FIELDS = {
+    'by_role': 'role',
+    'by_tier': 'subscription_tier',
+    'by_location': 'location',
+}
+
+
+def index_key(value):
+    """Firebase keys can't contain . $ # [ ] / so normalise values before using them as keys."""
+    key = str(value or '').strip().lower()
+    for ch in '.$#[]/':
+        key = key.replace(ch, ',')
+    return key
+
+
+def build_card(uid, profile):
+    card = {field: profile.get(field) for field in CARD_FIELDS if profile.get(field) is not None}
+    card['uid'] = uid
+    return card
+
+
+def _index_entries(uid, profile):
+    """Returns { 'relative/path': value } for every index entry this profile should own."""
+    entries = {}
+    card = build_card(uid, profile)
+    for index_name, field in INDEXED_FIELDS.items():
+        key = index_key(profile.get(field))
+        if key:
+            entries[f'{index_name}/{key}/{uid}'] = card
+    return entries
+
+
+def sync_user_index(rtdb, uid, profile, previous=None):
+    """
+    Moves a user's index entries from their previous profile to the new one
+    in a single multi-path update. Pass profile=None to drop the user entirely.
+    """
+    updates = {}
+    if previous:
+        for path in _index_entries(uid, previous):
+            updates[path] = None
+    if profile:
+        updates.update(_index_entries(uid, profile))
+    if updates:
+        rtdb.reference(INDEX_ROOT).update(updates)
+
+
+def fresh_profile(rtdb, uid):
+    """
+    users/{uid} straight from Firebase. Index moves must start from the live profile:
+    get(etag=True) bypasses RTDBCache, whose per-worker copy can be 30s stale.
+    """
+    profile, _ = rtdb.reference(f'users/{uid}').get(etag=True)
+    return profile if isinstance(profile, dict) else {}
+
+
+def update_user_profile(rtdb, uid, changes):
+    """Applies changes to users/{uid} and moves the user's index entries to match."""
+    previous = fresh_profile(rtdb, uid)
+    rtdb.reference(f'users/{uid}').update(changes)
+    sync_user_index(rtdb, uid, {**previous, **changes}, previous)
+    return previous
+
+
+def users_by(rtdb, index_name, value):
+    """Returns { uid: card } for every user whose indexed field equals value."""
+    key = index_key(value)
+    if not key:
+        return {}
+    return rtdb.reference(f'{INDEX_ROOT}/{index_name}/{key}').get() or {}
+
+
+def users_in_range(rtdb, index_name, value, field, start=None, end=None):
+    """
+    Ordered range query inside one index bucket, e.g. free-tier users created
+    between two dates. Needs an .indexOn for field on that bucket.
+    """
+    key = index_key(value)
+    if not key:
+        return {}
+    query = rtdb.reference(f'{INDEX_ROOT}/{index_name}/{key}').order_by_child(field)
+    if start is not None:
+        query = query.start_at(start)
+    if end is not None:
+        query = query.end_at(end)
+    return query.get() or {}
+
+
+def users_by_roles(rtdb, roles):
+    """{ uid: card } across several by_role buckets, one read per bucket."""
+    matches = {}
+    for role in roles:
+        matches.update(users_by(rtdb, 'by_role', role))
+    return matches
+
+
+def users_page(rtdb, index_name, values, after=None, limit=20):
+    """
+    One page of cards across several buckets of an index, ordered by (value, uid),
+    e.g. the chat directory over every chat role. Each bucket is read with
+    order_by_key + limit_to_first, so a page costs O(limit), not O(bucket).
+    after is the previous page's cursor ('value/uid').
+    :return: ([(value, uid, card)], next cursor or None)
+    """
+    after_value, _, after_uid = (after or '').partition('/')
+    rows = []
+    for value in sorted({index_key(v) for v in values if index_key(v)}):
+        if after_value and value < after_value:
+            continue
+        query = rtdb.reference(f'{INDEX_ROOT}/{index_name}/{value}').order_by_key()
+        # One extra row tells us whether another page follows
+        want = limit + 1 - len(rows)
+        if value == after_value and after_uid:
+            query = query.start_at(after_uid)
+            want += 1  # start_at is inclusive of the cursor row
+        bucket = query.limit_to_first(want).get() or {}
+        for uid in sorted(bucket):
+            if value == after_value and uid <= after_uid:
+                continue
+            if isinstance(bucket[uid], dict):
+                rows.append((value, uid, bucket[uid]))
+        if len(rows) > limit:
+            break
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, f"{rows[-1][0]}/{rows[-1][1]}"
+    return rows, None
+
+
+def get_users(rtdb, uids):
+    """Fetches only the named profiles (each one is cached individually by RTDBCache)."""
+    profiles = {}
+    for uid in uids:
+        if not uid:
+            continue
+        profile = rtdb.reference(f'users/{uid}').get()
+        if isinstance(profile, dict):
+            profiles[uid] = profile
+    return profiles
+
+
+def rebuild_user_indexes(rtdb):
+    """Rebuilds the whole index tree from 'users'. Used for the one-off backfill."""
+    all_users = rtdb.reference('users').get() or {}
+    tree = {}
+    for uid, profile in all_users.items():
+        if not isinstance(profile, dict):
+            continue
+        for path, value in _index_entries(uid, profile).items():
+            node = tree
+            parts = path.split('/')
+            for part in parts[:-1]:
+                node = node.setdefault(part, {})
+            node[parts[-1]] = value
+    rtdb.reference(INDEX_ROOT).set(tree)
+    return len(all_users)
+
+
+if __name__ == "__main__":
+    from main import rtdb
+    total = rebuild_user_indexes(rtdb)
+    print(f"Successfully indexed {total} users under '{INDEX_ROOT}'.")
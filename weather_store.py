@@ -0,0 +1,143 @@
+"""
+Weather observation history in farmerman.db.
+
+Every reading is appended to weather_readings and folded into hourly and daily
+rollups (weather_rollups) in the same transaction. Raw rows only need to live
+for RAW_RETENTION; compact() drops older ones, and the rollups keep the history.
+
+    record_observation(region_key, reading)
+    series(region_key, start, end, resolution='hour')   # 'raw', 'hour' or 'day'
+    consecutive_days(region_key, 'humidity_mean', '>=', 85)
+
+All functions need an app context (they use the Flask-SQLAlchemy session).
+"""
+import operator
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+
+from models import db, WeatherReading, WeatherRollup
+
+RAW_RETENTION = timedelta(days=7)
+RESOLUTIONS = ('hour', 'day')
+WET_WORDS = ('rain', 'drizzle', 'thunder', 'storm')
+
+COMPARATORS = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+
+
+def bucket_start(moment, resolution):
+    if resolution == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _fold_into_rollup(region, resolution, reading, moment, wet):
+    """INSERT ... ON CONFLICT DO UPDATE: one statement per bucket, no read-modify-write."""
+    table = WeatherRollup.__table__
+    stmt = insert(table).values(
+        region=region, resolution=resolution, bucket_start=bucket_start(moment, resolution),
+        count=1,
+        temp_sum=reading['temp'], temp_min=reading['temp'], temp_max=reading['temp'],
+        humidity_sum=reading['humidity'], humidity_max=reading['humidity'],
+        wind_sum=reading['wind'], wind_max=reading['wind'],
+        wet_count=1 if wet else 0
+    )
+    new = stmt.excluded
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.region, table.c.resolution, table.c.bucket_start],
+        set_={
+            'count': table.c.count + 1,
+            'temp_sum': table.c.temp_sum + new.temp_sum,
+            'temp_min': func.min(table.c.temp_min, new.temp_min),
+            'temp_max': func.max(table.c.temp_max, new.temp_max),
+            'humidity_sum': table.c.humidity_sum + new.humidity_sum,
+            'humidity_max': func.max(table.c.humidity_max, new.humidity_max),
+            'wind_sum': table.c.wind_sum + new.wind_sum,
+            'wind_max': func.max(table.c.wind_max, new.wind_max),
+            'wet_count': table.c.wet_count + new.wet_count,
+        }
+    ))
+
+
+def record_observation(region, reading, observed_at=None):
+    """Appends one reading ({temp, humidity, wind, condition}) and updates its hour and day buckets."""
+    moment = observed_at or datetime.now()
+    values = {
+        'temp': float(reading.get('temp', 0)),
+        'humidity': float(reading.get('humidity', 0)),
+        'wind': float(reading.get('wind', 0)),
+    }
+    condition = str(reading.get('condition', ''))
+    wet = any(word in condition.lower() for word in WET_WORDS)
+
+    db.session.add(WeatherReading(region=region, observed_at=moment, condition=condition, **values))
+    for resolution in RESOLUTIONS:
+        _fold_into_rollup(region, resolution, values, moment, wet)
+    db.session.commit()
+
+
+def compact(retention=RAW_RETENTION, now=None):
+    """Deletes raw readings older than the retention window; their rollups are already stored."""
+    cutoff = (now or datetime.now()) - retention
+    deleted = WeatherReading.query.filter(WeatherReading.observed_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+def _rollup_row(r):
+    return {
+        'time': r.bucket_start.strftime("%Y-%m-%d %H:%M"),
+        'count': r.count,
+        'temp_mean': round(r.temp_sum / r.count, 2),
+        'temp_min': r.temp_min,
+        'temp_max': r.temp_max,
+        'humidity_mean': round(r.humidity_sum / r.count, 2),
+        'humidity_max': r.humidity_max,
+        'wind_mean': round(r.wind_sum / r.count, 2),
+        'wind_max': r.wind_max,
+        'wet_share': round(r.wet_count / r.count, 2)
+    }
+
+
+def series(region, start, end, resolution='hour'):
+    """
+    Readings for one region between start and end (inclusive), oldest first.
+    'raw' only reaches back RAW_RETENTION; 'hour' and 'day' cover the full history.
+    """
+    if resolution == 'raw':
+        rows = (WeatherReading.query
+                .filter(WeatherReading.region == region,
+                        WeatherReading.observed_at >= start, WeatherReading.observed_at <= end)
+                .order_by(WeatherReading.observed_at).all())
+        return [{'time': r.observed_at.strftime("%Y-%m-%d %H:%M:%S"), 'temp': r.temp, 'humidity': r.humidity,
+                 'wind': r.wind, 'condition': r.condition} for r in rows]
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Unknown resolution '{resolution}'")
+
+    rows = (WeatherRollup.query
+            .filter(WeatherRollup.region == region, WeatherRollup.resolution == resolution,
+                    WeatherRollup.bucket_start >= bucket_start(start, resolution),
+                    WeatherRollup.bucket_start <= end)
+            .order_by(WeatherRollup.bucket_start).all())
+    return [_rollup_row(r) for r in rows]
+
+
+def consecutive_days(region, metric, op, threshold, end=None):
+    """
+    How many days in a row, ending on `end` (default today), the daily rollup met
+    metric <op> threshold, e.g. consecutive_days('nakuru', 'humidity_mean', '>=', 85).
+    A day with no readings breaks the streak; streaks are counted up to 30 days back.
+    """
+    end_day = bucket_start(end or datetime.now(), 'day')
+    compare = COMPARATORS[op]
+    days = {row['time']: row for row in series(region, end_day - timedelta(days=30), end_day, 'day')}
+
+    streak = 0
+    day = end_day
+    while True:
+        row = days.get(day.strftime("%Y-%m-%d %H:%M"))
+        if row is None or not compare(row[metric], threshold):
+            return streak
+        streak += 1
+        day -= timedelta(days=1)